@@ -7,6 +7,9 @@ django_asgi_app = get_asgi_application()
 from channels.auth import AuthMiddlewareStack
 from channels.routing import ProtocolTypeRouter, URLRouter
 from orcadjango.urls import websocket_urlpatterns
+from orcaserver.orca import start_server_tasks
+
+start_server_tasks()
 
 application = ProtocolTypeRouter({
     'http': django_asgi_app,
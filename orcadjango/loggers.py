@@ -1,6 +1,11 @@
 import logging
 import json
 import time
+import asyncio
+import threading
+from queue import Queue, Full
+from urllib.parse import parse_qs
+from logging.handlers import QueueHandler
 import channels.layers
 try:
     # redis 4.*
@@ -9,10 +14,12 @@ except ModuleNotFoundError:
     # redis 3.*
     from redis import RedisError
 from redis.exceptions import ConnectionError as RedisConnectionError
-from asgiref.sync import async_to_sync
-from channels.generic.websocket import WebsocketConsumer
+from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.db import database_sync_to_async
 from django.utils import timezone
+from django.conf import settings
 from django import db
+from django.db.models import Max
 import re
 
 import logging
@@ -21,11 +28,91 @@ logger = logging.getLogger(__name__)
 channel_layer = channels.layers.get_channel_layer()
 
 IGNORE_MESSAGE_FILTER = ['^registering injectable', '^(start|finish): call function to provide injectable']
+IGNORE_MESSAGE_REGEX = re.compile(
+    '|'.join(f'(?:{expr})' for expr in IGNORE_MESSAGE_FILTER))
 
 def clear_db_connections():
     for conn in db.connections.all():
         conn.close_if_unusable_or_obsolete()
 
+class ChannelPublisher:
+    '''
+    long-lived publisher sending messages to the channel layer. messages can
+    be published from any thread, they are passed to an event loop running
+    in a background thread. the connection of the channel layer is bound to
+    that loop and reused for all messages. the queued messages of a channel
+    are coalesced into one group message of type "messages" (see
+    ScenarioLogConsumer.messages), in order per channel. messages not queued
+    because the queue is full are counted in "dropped"
+    '''
+    batch_size = 100
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._loop = None
+        self._queue = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(ready, ),
+                                            daemon=True)
+            self._thread.start()
+            ready.wait()
+
+    def _run(self, ready: threading.Event):
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue(self.maxsize)
+        self._loop.create_task(self._publish())
+        ready.set()
+        self._loop.run_forever()
+
+    def publish(self, channel: str, message: dict):
+        '''queue a message to be sent to the group "channel"'''
+        self.start()
+        self._loop.call_soon_threadsafe(self._enqueue, channel, message)
+
+    def _enqueue(self, channel: str, message: dict):
+        try:
+            self._queue.put_nowait((channel, message))
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def _send_all(self, channel: str, messages: list):
+        message = messages[0] if len(messages) == 1 \
+            else {'type': 'messages', 'messages': messages}
+        try:
+            await channel_layer.group_send(channel, message)
+        except (RedisError, RedisConnectionError, OSError,
+                RuntimeError) as e:
+            logger.debug(e)
+        # e.g. payload not serializable or channel full, the publisher has to
+        # keep running for the following messages
+        except Exception:
+            self.dropped += len(messages)
+            logger.exception(f'Failed to send messages to {channel}')
+
+    async def _publish(self):
+        while True:
+            batch = [await self._queue.get()]
+            while not self._queue.empty() and len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+            per_channel = {}
+            for channel, message in batch:
+                per_channel.setdefault(channel, []).append(message)
+            await asyncio.gather(*(self._send_all(channel, messages)
+                                   for channel, messages in per_channel.items()))
+
+
+publisher = ChannelPublisher()
+
+
 def send(channel: str, message: str, log_type: str='log_message',
          status=None, **kwargs):
     rec = {
@@ -37,7 +124,7 @@ def send(channel: str, message: str, log_type: str='log_message',
         rec['status'] = status
     rec.update(kwargs)
 
-    async_to_sync(channel_layer.group_send)(channel, rec)
+    publisher.publish(channel, rec)
 
 
 class WebSocketHandler(logging.StreamHandler):
@@ -53,72 +140,436 @@ class WebSocketHandler(logging.StreamHandler):
             logger.debug(e)
 
 
+def format_timestamp(timestamp) -> str:
+    return timezone.localtime(timestamp).strftime('%d.%m.%Y %H:%M:%S')
+
+
 class ScenarioHandler(WebSocketHandler):
-    def __init__(self, scenario, *args, **kwargs):
+    '''
+    stores the log records of a scenario in the database and sends them to
+    the room of the scenario. the entries are buffered and written in bulk
+    when the buffer is full or the flush interval is reached. records with a
+    status (start and end of steps and runs) and errors are written
+    immediately.
+    every entry gets the next sequence number of the scenario, the entries
+    are sent to the room only after they are stored, so that clients can
+    replay the stored entries and continue with the live ones without gaps
+    '''
+    def __init__(self, scenario, *args, run=None, **kwargs):
         super().__init__(*args, **kwargs)
+        from orcaserver.models import LogEntry
         self.scenario = scenario
+        self.run = run
         self.room = f'scenario_{scenario.id}'
+        self.buffer_size = getattr(settings, 'ORCA_LOG_BUFFER_SIZE', 100)
+        self.buffer_max = getattr(settings, 'ORCA_LOG_BUFFER_MAX', 10000)
+        self.flush_interval = getattr(settings, 'ORCA_LOG_FLUSH_INTERVAL', 0.5)
+        self.buffer = []
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+        self.seq = LogEntry.objects.filter(scenario_id=scenario.id).aggregate(
+            max_seq=Max('seq'))['max_seq'] or 0
 
     @staticmethod
-    def _do_ignore(record) -> bool:
-        message = record.getMessage()
-        for expr in IGNORE_MESSAGE_FILTER:
-            if re.search(expr, message):
-                return True
-        return False
+    def _do_ignore(message: str) -> bool:
+        return IGNORE_MESSAGE_REGEX.search(message) is not None
 
     def emit(self, record):
-        if self._do_ignore(record):
+        message = record.getMessage()
+        if self._do_ignore(message):
             return
-        clear_db_connections()
         from orcaserver.models import LogEntry
-        message = record.getMessage()
         status = getattr(record, 'status', {})
-        LogEntry.objects.create(
-            scenario_id=self.scenario.id,
-            message=message,
-            timestamp=timezone.now(),
-            level=record.levelname,
-            status=status
-        )
+        with self._buffer_lock:
+            self.seq += 1
+            entry = LogEntry(
+                scenario_id=self.scenario.id,
+                run_id=self.run.id if self.run else None,
+                seq=self.seq,
+                message=message,
+                timestamp=timezone.now(),
+                level=record.levelname,
+                status=status
+            )
+            self.buffer.append(entry)
+            n_buffered = len(self.buffer)
         record.scenario = self.scenario.name
+        if (status or record.levelno >= logging.ERROR or
+                n_buffered >= self.buffer_size):
+            self.flush()
+        else:
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        with self._buffer_lock:
+            if self._timer:
+                return
+            self._timer = threading.Timer(self.flush_interval,
+                                          self._timed_flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _timed_flush(self):
+        self.flush()
+        # the timer thread opened a connection of its own
+        db.connection.close()
+
+    def flush(self):
+        '''
+        write the buffered log entries into the database and send them to
+        the room
+        '''
+        # flushes in order of the sequence numbers
+        with self._flush_lock:
+            with self._buffer_lock:
+                entries, self.buffer = self.buffer, []
+                if self._timer:
+                    self._timer.cancel()
+                    self._timer = None
+            if not entries:
+                return
+            clear_db_connections()
+            from orcaserver.models import LogEntry
+            try:
+                LogEntry.objects.bulk_create(entries)
+            except db.Error as e:
+                logger.debug(e)
+                # retry with the next flush, drop the oldest entries if the
+                # buffer exceeds its limit
+                with self._buffer_lock:
+                    self.buffer = (entries + self.buffer)[-self.buffer_max:]
+                return
+            for entry in entries:
+                try:
+                    send(self.room, entry.message, log_type='log_message',
+                         level=entry.level, status=entry.status,
+                         seq=entry.seq,
+                         timestamp=format_timestamp(entry.timestamp))
+                except (RedisError, RedisConnectionError, OSError,
+                        RuntimeError) as e:
+                    logger.debug(e)
+
+    def close(self):
+        self.flush()
+        super().close()
+
+
+class LogRateLimiter:
+    '''
+    limits the records of a scenario before they are queued. ignored messages
+    are filtered out, repetitions of a message are coalesced into a single
+    record and the number of records per second is capped per level.
+    records with a status and errors always pass
+    '''
+    def __init__(self, rates: dict = None):
+        if rates is None:
+            rates = getattr(settings, 'ORCA_LOG_RATE_LIMITS', {})
+        # max. records per second by level name
+        self.rates = rates
+        self._last = None
+        self._last_record = None
+        self._repeated = 0
+        self._window = None
+        self._counts = {}
+        self._suppressed = 0
+
+    @staticmethod
+    def _make_record(template: logging.LogRecord, level: int, message: str):
+        return logging.LogRecord(template.name, level, template.pathname,
+                                 template.lineno, message, None, None)
+
+    def process(self, record: logging.LogRecord) -> list:
+        '''returns the records to pass on in place of the given one'''
+        message = record.getMessage()
+        if IGNORE_MESSAGE_REGEX.search(message):
+            return []
+        keep = (getattr(record, 'status', None) or
+                record.levelno >= logging.ERROR)
+        key = (record.levelno, message)
+        if not keep and key == self._last:
+            self._repeated += 1
+            return []
+        records = []
+        if self._repeated:
+            records.append(self._make_record(
+                self._last_record, self._last_record.levelno,
+                f'last message repeated {self._repeated} times'))
+            self._repeated = 0
+        self._last = key
+        self._last_record = record
+        window = int(record.created)
+        # report the suppressed records when the second is over or the
+        # step/run ends
+        if self._suppressed and (keep or window != self._window):
+            records.append(self._make_record(
+                record, logging.WARNING,
+                f'{self._suppressed} log messages suppressed'))
+            self._suppressed = 0
+        if not keep:
+            if window != self._window:
+                self._window = window
+                self._counts = {}
+            count = self._counts.get(record.levelname, 0) + 1
+            self._counts[record.levelname] = count
+            limit = self.rates.get(record.levelname)
+            if limit is not None and count > limit:
+                self._suppressed += 1
+                return records
+        records.append(record)
+        return records
+
+
+class LogQueueHandler(QueueHandler):
+    '''
+    hands the records over to a queue without blocking the logging thread.
+    records are dropped if the queue is full, except records with a status
+    and errors
+    '''
+    def __init__(self, queue, limiter: LogRateLimiter = None):
+        super().__init__(queue)
+        self.limiter = limiter
+        self.dropped = 0
+
+    def emit(self, record):
+        records = self.limiter.process(record) if self.limiter else [record]
+        for rec in records:
+            super().emit(rec)
+
+    def enqueue(self, record):
+        if getattr(record, 'status', None) or record.levelno >= logging.ERROR:
+            self.queue.put(record)
+            return
         try:
-            send(self.room, message, log_type='log_message',
-                 level=record.levelname, status=status)
-        except (RedisError, RedisConnectionError, OSError, RuntimeError) as e:
-            logger.debug(e)
+            self.queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    '''
+    decouples the handlers of a logger from the threads logging to it.
+    the records are put into a queue and passed to the handlers by a
+    dedicated listener thread, so that slow handlers (database, redis) don't
+    stall the steps
+    '''
+    _stop = object()
+
+    def __init__(self, maxsize: int = None, rates: dict = None):
+        if maxsize is None:
+            maxsize = getattr(settings, 'ORCA_LOG_QUEUE_SIZE', 10000)
+        self.queue = Queue(maxsize)
+        self.queue_handler = LogQueueHandler(
+            self.queue, limiter=LogRateLimiter(rates=rates))
+        self.handlers = []
+        self._thread = None
+
+    def add_handler(self, handler: logging.Handler):
+        self.handlers.append(handler)
+        self.start()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._listen, daemon=True)
+        self._thread.start()
+
+    def _listen(self):
+        while True:
+            record = self.queue.get()
+            try:
+                if record is self._stop:
+                    break
+                for handler in list(self.handlers):
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+            except Exception as e:
+                logger.debug(e)
+            finally:
+                self.queue.task_done()
+        db.connection.close()
+
+    def drain(self):
+        '''wait until all queued records are handled'''
+        if self._thread and self._thread.is_alive():
+            self.queue.join()
 
+    def clear_handlers(self):
+        '''handle the queued records and close the handlers'''
+        self.drain()
+        for handler in self.handlers:
+            handler.close()
+        self.handlers.clear()
 
-class ScenarioLogConsumer(WebsocketConsumer):
-    def connect(self):
-        '''join room'''
+    def stop(self):
+        if self._thread and self._thread.is_alive():
+            self.queue.put(self._stop)
+            self._thread.join()
+
+    @property
+    def metrics(self) -> dict:
+        return {
+            'queue_depth': self.queue.qsize(),
+            'dropped': self.queue_handler.dropped,
+        }
+
+
+class ScenarioLogConsumer(AsyncWebsocketConsumer):
+    '''
+    sends the log events of a scenario to the client in batches, one frame
+    per interval with up to "batch_size" records. the live frames are
+    numbered ("id"), the client acknowledges the received frames with
+    {"ack": id}. no more frames are sent while "max_unacked" frames are not
+    acknowledged, the records pending meanwhile measure how far the client
+    is behind. if they exceed "max_pending", DEBUG records are skipped,
+    if that is not enough the oldest records without status as well. the
+    number of skipped records is reported with the next frame, the client
+    can fetch them from the stored log
+    '''
+    batch_interval = 0.1
+    batch_size = 200
+    max_pending = 1000
+    max_unacked = 10
+
+    async def connect(self):
+        '''
+        join room, if the sequence number "since" is passed in the query
+        string the stored entries after it are replayed first
+        '''
         self.scenario_id = self.scope['url_route']['kwargs']['scenario_id']
         self.room_name = f'scenario_{self.scenario_id}'
+        self.pending = []
+        self.skipped = 0
+        self.last_seq = 0
+        self.frame_id = 0
+        self.acked = 0
+        self._ack_event = asyncio.Event()
+        self._sender = None
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        since = query.get('since')
         try:
-            async_to_sync(self.channel_layer.group_add)(
+            # join before replaying, entries stored after the replay
+            # are received live
+            await self.channel_layer.group_add(
                 self.room_name,
                 self.channel_name
             )
-            self.accept()
+            await self.accept()
         # redis is not up, what to do?
         except (RedisError, RedisConnectionError, OSError) as e:
             logger.debug(e)
+            return
+        # malformed values are ignored, nothing is replayed then
+        if since and since[0].isdigit():
+            self.last_seq = int(since[0])
+            await self._replay()
+
+    def _stored_entries(self, after_seq: int) -> list:
+        from orcaserver.models import LogEntry
+        entries = LogEntry.objects.filter(
+            scenario_id=self.scenario_id, seq__gt=after_seq).order_by(
+                'seq')[:self.batch_size]
+        return [{
+            'message': entry.message,
+            'level': entry.level,
+            'timestamp': format_timestamp(entry.timestamp),
+            'status': entry.status,
+            'seq': entry.seq,
+        } for entry in entries]
+
+    async def _replay(self):
+        '''send the stored entries after the last sequence number'''
+        while True:
+            records = await database_sync_to_async(self._stored_entries)(
+                self.last_seq)
+            if not records:
+                break
+            self.last_seq = records[-1]['seq']
+            await self.send(text_data=json.dumps({'records': records}))
 
-    def disconnect(self, close_code):
+    async def disconnect(self, close_code):
         '''leave room'''
-        async_to_sync(self.channel_layer.group_discard)(
+        if self._sender:
+            self._sender.cancel()
+        await self.channel_layer.group_discard(
             self.room_name,
             self.channel_name
         )
 
-    def log_message(self, event):
-        '''send "log_message"'''
+    async def receive(self, text_data=None, bytes_data=None):
+        '''acknowledgement of the received frames'''
         try:
-            self.send(text_data=json.dumps({
-                'message': event['message'],
-                'level': event.get('level'),
-                'timestamp': event.get('timestamp'),
-                'status': event.get('status')
-            }))
-        except (RedisError, OSError, RedisConnectionError) as e:
-            logger.debug(e)
+            ack = int(json.loads(text_data)['ack'])
+        except (TypeError, ValueError, KeyError):
+            return
+        self.acked = max(self.acked, ack)
+        self._ack_event.set()
+
+    async def messages(self, event):
+        '''handle the messages coalesced by the publisher in order'''
+        for message in event['messages']:
+            await self.dispatch(message)
+
+    @staticmethod
+    def _is_skippable(record: dict) -> bool:
+        return record.get('level') == 'DEBUG' and not record.get('status')
+
+    async def log_message(self, event):
+        '''queue "log_message" to be sent with the next batch'''
+        seq = event.get('seq')
+        # already replayed
+        if seq is not None:
+            if seq <= self.last_seq:
+                return
+            self.last_seq = seq
+        record = {
+            'message': event['message'],
+            'level': event.get('level'),
+            'timestamp': event.get('timestamp'),
+            'status': event.get('status'),
+            'seq': seq,
+        }
+        if len(self.pending) >= self.max_pending:
+            if self._is_skippable(record):
+                self.skipped += 1
+                return
+            n_pending = len(self.pending)
+            self.pending = [r for r in self.pending
+                            if not self._is_skippable(r)]
+            self.skipped += n_pending - len(self.pending)
+        if len(self.pending) >= self.max_pending:
+            # hard limit, the oldest records without status are dropped (a
+            # batch at once, not one per arriving record)
+            n_pending = len(self.pending)
+            excess = n_pending - self.max_pending + self.batch_size
+            kept = []
+            for r in self.pending:
+                if excess and not r.get('status'):
+                    excess -= 1
+                    continue
+                kept.append(r)
+            self.pending = kept
+            self.skipped += n_pending - len(self.pending)
+        self.pending.append(record)
+        if not self._sender or self._sender.done():
+            self._sender = asyncio.ensure_future(self._send_batches())
+
+    async def _send_batches(self):
+        # collect the records arriving during the interval
+        await asyncio.sleep(self.batch_interval)
+        while self.pending:
+            # client is behind, records are pending until it catches up
+            while self.frame_id - self.acked >= self.max_unacked:
+                self._ack_event.clear()
+                await self._ack_event.wait()
+            records = self.pending[:self.batch_size]
+            del self.pending[:self.batch_size]
+            self.frame_id += 1
+            frame = {'id': self.frame_id, 'records': records}
+            if self.skipped:
+                frame['skipped'] = self.skipped
+                self.skipped = 0
+            try:
+                await self.send(text_data=json.dumps(frame))
+            except (RedisError, OSError, RedisConnectionError) as e:
+                logger.debug(e)
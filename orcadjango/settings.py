@@ -17,6 +17,66 @@ HOST = os.environ.get('DJANGO_HOST')
 REDIS_HOST = os.environ.get('REDIS_HOST', '127.0.0.1')
 REDIS_PORT = os.environ.get('REDIS_PORT', 6379)
 
+# how the steps of a scenario are run: 'thread' (inside the web process),
+# 'process' (separate worker process per run) or dotted path to an executor
+ORCA_EXECUTOR = os.environ.get('ORCA_EXECUTOR', 'thread')
+# the meta data of the modules is stored in manifests next to the modules,
+# this directory is used if those are not writable
+ORCA_MANIFEST_DIR = os.environ.get('ORCA_MANIFEST_DIR')
+# number of preloaded orca instances kept ready per module
+ORCA_POOL_SIZE = int(os.environ.get('ORCA_POOL_SIZE', 1))
+# the known modules are loaded in the background after the start of the
+# server (warm-up, not on management commands), requests wait for a module
+# still loading up to ORCA_MODULE_WAIT seconds before being answered with
+# "503 Service Unavailable"
+ORCA_WARMUP = os.environ.get('ORCA_WARMUP', 'true').lower() != 'false'
+ORCA_WARMUP_WORKERS = int(os.environ.get('ORCA_WARMUP_WORKERS', 2))
+ORCA_MODULE_WAIT = float(os.environ.get('ORCA_MODULE_WAIT', 10))
+# interval (in seconds) the sources of the loaded modules are checked for
+# changes, changed modules are reloaded. 0 to disable
+ORCA_MODULE_WATCH_INTERVAL = float(
+    os.environ.get('ORCA_MODULE_WATCH_INTERVAL', 0))
+
+# max. number of cached values of derived injectables (calculated from the
+# values of their parents)
+ORCA_DERIVED_CACHE_SIZE = int(os.environ.get('ORCA_DERIVED_CACHE_SIZE', 1000))
+
+# values of injectables larger than this (in bytes) are moved to the blob store,
+# where equal values are stored only once. the decoded values of the store are
+# cached (max. number of values)
+ORCA_BLOB_THRESHOLD = int(os.environ.get('ORCA_BLOB_THRESHOLD', 65536))
+ORCA_BLOB_CACHE_SIZE = int(os.environ.get('ORCA_BLOB_CACHE_SIZE', 100))
+# unreferenced blobs are deleted by the management command "gcblobs" after
+# this number of hours
+ORCA_BLOB_GRACE_HOURS = 24
+
+# log entries of runs are written in bulk when the buffer is full or the flush
+# interval (in seconds) is reached, the buffer never grows beyond the maximum.
+# the entries are sent to the clients after being written
+ORCA_LOG_BUFFER_SIZE = 100
+ORCA_LOG_FLUSH_INTERVAL = 0.5
+ORCA_LOG_BUFFER_MAX = 10000
+# max. number of log records waiting to be handled, further records are
+# dropped (except errors and status records)
+ORCA_LOG_QUEUE_SIZE = 10000
+# max. number of log entries returned per request ("page_size" and "n_last"
+# are limited to it)
+ORCA_LOG_MAX_PAGE_SIZE = 5000
+# log retention (see management command "compactlogs"): the logs of the last
+# runs of a scenario are kept completely, older ones are reduced to INFO and
+# ERROR entries, even older ones are moved to compressed files
+ORCA_LOG_KEEP_RUNS = int(os.environ.get('ORCA_LOG_KEEP_RUNS', 5))
+ORCA_LOG_ARCHIVE_RUNS = int(os.environ.get('ORCA_LOG_ARCHIVE_RUNS', 20))
+ORCA_LOG_ARCHIVE_DIR = os.environ.get(
+    'ORCA_LOG_ARCHIVE_DIR', os.path.join(BASE_DIR, 'archive', 'logs'))
+# max. number of log records per second of a scenario by level, errors and
+# status records are never suppressed
+ORCA_LOG_RATE_LIMITS = {
+    'DEBUG': 50,
+    'INFO': 100,
+    'WARNING': 100,
+}
+
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = False
 
@@ -83,6 +143,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'EXCEPTION_HANDLER': 'orcaserver.views.exception_handler',
 }
 
 SIMPLE_JWT = {
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'orcadjango.settings')
 
 application = get_wsgi_application()
+
+from orcaserver.orca import start_server_tasks
+
+start_server_tasks()
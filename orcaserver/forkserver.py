@@ -0,0 +1,26 @@
+'''
+preloaded by the fork server of the ProcessExecutor. sets up django and
+loads an instance of every module listed in ORCA_PRELOAD_MODULES, the forked
+worker processes inherit those copy-on-write instead of loading the modules
+again
+'''
+import os
+import logging
+import django
+
+from orcaserver import orca
+
+logger = logging.getLogger(__name__)
+
+orca.IN_WORKER = True
+django.setup()
+
+for module in filter(None, os.environ.get('ORCA_PRELOAD_MODULES', '').split(',')):
+    try:
+        wrapper = orca.OrcaWrapper(module)
+        orca._TEMPLATES[module] = wrapper
+        # to detect changes of the sources since the preload
+        orca._TEMPLATE_SOURCES[module] = orca.source_state(
+            getattr(wrapper.orca, '_module_set', {module}))
+    except Exception:
+        logger.exception(f'Failed to preload module {module}')
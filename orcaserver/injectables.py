@@ -2,38 +2,120 @@ import json
 import ast
 import pandas
 from osgeo import ogr
+import io
 import datetime
 import importlib
-import ast
+import importlib.util
+import importlib.metadata
+import logging
+import threading
+import functools
+from collections import Counter
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+
+ENTRY_POINT_GROUP = 'orcadjango.converters'
+
+logger = logging.getLogger(__name__)
 
 
 class OrcaTypeMap:
+    '''
+    base class of the converters between values of injectables and their
+    string representation. subclasses are registered for their data type
+    automatically, converters of other packages are registered by importing
+    them via the entry point group "orcadjango.converters" or with the
+    decorator register_converter
+    '''
     data_type = None
     description = ''
+    # format of the binary representation (see to_bytes), the values of
+    # converters without one are stored as text only
+    binary_format = None
+    # errors of to_bytes for values which can't be represented in the binary
+    # format, those values are stored as text instead
+    binary_errors = (ValueError, TypeError)
+    # values are stored in the geometry column (see GeometryConverter)
+    spatial = False
+
+    # data type (class or dotted path) -> converter class
+    _registry = {}
+    # dotted path of data class -> converter instance
+    _cache = {}
+    _entry_points_loaded = False
+    _lock = threading.Lock()
+    # number of look-ups by converter class name
+    lookups = Counter()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # subclasses inheriting the data type don't replace their parent
+        if cls.__dict__.get('data_type') is not None:
+            OrcaTypeMap.register(cls)
 
     @staticmethod
-    def get(mod_str):
-        cls = None
-        module = None
-        if isinstance(mod_str, str):
+    def register(converter_cls, data_type=None):
+        '''register the converter class for the data type'''
+        if data_type is not None:
+            converter_cls.data_type = data_type
+        with OrcaTypeMap._lock:
+            OrcaTypeMap._registry[converter_cls.data_type] = converter_cls
+            OrcaTypeMap._cache.clear()
+
+    @staticmethod
+    def _load_entry_points():
+        OrcaTypeMap._entry_points_loaded = True
+        try:
+            entry_points = importlib.metadata.entry_points(
+                group=ENTRY_POINT_GROUP)
+        except Exception:
+            return
+        for entry_point in entry_points:
             try:
-                module_class = mod_str.split('.')
-                module_name = '.'.join(module_class[:-1])
-                classname = module_class[-1]
-                module = getattr(importlib.import_module(module_name),
-                                 classname, str)
-            except ModuleNotFoundError:
-                pass
-        for sub in OrcaTypeMap.__subclasses__():
-            comp = mod_str if isinstance(sub.data_type, str) else module
-            if sub.data_type == comp:
-                cls = sub
-                break
-        if not cls:
-            cls = DefaultConverter
-        return cls()
+                # defining the subclass registers it
+                entry_point.load()
+            except Exception:
+                logger.exception(f'Failed to load the converters of '
+                                 f'{entry_point.name}')
+
+    @staticmethod
+    def _resolve(mod_str):
+        registry = OrcaTypeMap._registry
+        if not isinstance(mod_str, str):
+            return DefaultConverter
+        if mod_str in registry:
+            return registry[mod_str]
+        try:
+            module_class = mod_str.split('.')
+            module_name = '.'.join(module_class[:-1])
+            classname = module_class[-1]
+            module = getattr(importlib.import_module(module_name),
+                             classname, str)
+        except (ModuleNotFoundError, ValueError):
+            return DefaultConverter
+        try:
+            return registry.get(module, DefaultConverter)
+        # not a class
+        except TypeError:
+            return DefaultConverter
+
+    @staticmethod
+    def get(mod_str):
+        '''converter for the data class (dotted path), resolved only once'''
+        if not OrcaTypeMap._entry_points_loaded:
+            OrcaTypeMap._load_entry_points()
+        converter = OrcaTypeMap._cache.get(mod_str)
+        if converter is None:
+            converter = OrcaTypeMap._resolve(mod_str)()
+            OrcaTypeMap._cache[mod_str] = converter
+        OrcaTypeMap.lookups[type(converter).__name__] += 1
+        return converter
 
     def to_value(self, text):
         raise NotImplementedError
@@ -41,6 +123,24 @@ class OrcaTypeMap:
     def to_str(self, value):
         return str(value)
 
+    def to_bytes(self, value) -> bytes:
+        raise NotImplementedError
+
+    def from_bytes(self, data):
+        raise NotImplementedError
+
+
+def register_converter(data_type=None):
+    '''
+    class decorator registering a converter for the given data type (class or
+    dotted path of the class), the data type of the converter class if not
+    given
+    '''
+    def decorator(converter_cls):
+        OrcaTypeMap.register(converter_cls, data_type=data_type)
+        return converter_cls
+    return decorator
+
 
 class DefaultConverter(OrcaTypeMap):
 
@@ -108,9 +208,18 @@ class StringConverter(OrcaTypeMap):
         return text
 
 
+@functools.lru_cache(maxsize=None)
+def spatial_reference(srid: int) -> 'ogr.osr.SpatialReference':
+    '''spatial reference of the SRID, created once per SRID'''
+    s_ref = ogr.osr.SpatialReference()
+    s_ref.ImportFromEPSG(srid)
+    return s_ref
+
+
 class GeometryConverter(OrcaTypeMap):
     data_type = ogr.Geometry
     srid = 4326
+    spatial = True
 
     def to_str(self, value):
         if not value:
@@ -127,9 +236,25 @@ class GeometryConverter(OrcaTypeMap):
             return
         geom = ogr.CreateGeometryFromWkt(text)
         geom.FlattenTo2D()
-        s_ref = ogr.osr.SpatialReference()
-        s_ref.ImportFromEPSG(self.srid)
-        geom.AssignSpatialReference(s_ref)
+        geom.AssignSpatialReference(spatial_reference(self.srid))
+        return geom
+
+    def to_wkb(self, value) -> bytes:
+        '''2D geometry as WKB, the passed geometry is not changed'''
+        if not value:
+            return
+        if isinstance(value, str):
+            value = self.to_value(value)
+        else:
+            value = value.Clone()
+            value.FlattenTo2D()
+        return bytes(value.ExportToWkb())
+
+    def from_wkb(self, data):
+        if not data:
+            return
+        geom = ogr.CreateGeometryFromWkb(bytes(data))
+        geom.AssignSpatialReference(spatial_reference(self.srid))
         return geom
 
 
@@ -154,6 +279,11 @@ class DateConverter(OrcaTypeMap):
 
 class DataframeConverter(OrcaTypeMap):
     data_type = pandas.core.frame.DataFrame
+    # Arrow IPC file format, requires pyarrow
+    binary_format = 'arrow' if pyarrow else None
+    # e.g. object columns with mixed types or duplicate column names
+    binary_errors = ((pyarrow.ArrowException, ValueError, TypeError)
+                     if pyarrow else (ValueError, TypeError))
 
     def to_str(self, value):
         if value is None:
@@ -165,9 +295,25 @@ class DataframeConverter(OrcaTypeMap):
             return
         return pandas.read_json(text)
 
+    def to_bytes(self, value):
+        table = pyarrow.Table.from_pandas(value)
+        sink = pyarrow.BufferOutputStream()
+        with pyarrow.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    def from_bytes(self, data):
+        table = pyarrow.ipc.open_file(pyarrow.py_buffer(data)).read_all()
+        # steps may modify the frame in place, arrays converted without
+        # copying would be read-only
+        return table.to_pandas()
+
 
 class XArrayDatasetConverter(OrcaTypeMap):
     data_type = 'xarray.core.dataset.Dataset'
+    # netCDF (version 3), written and read by xarray with scipy
+    binary_format = 'netcdf' if (importlib.util.find_spec('xarray') and
+                                 importlib.util.find_spec('scipy')) else None
 
     def to_str(self, value):
         if value is None:
@@ -177,4 +323,19 @@ class XArrayDatasetConverter(OrcaTypeMap):
     def to_value(self, text):
         if not text:
             return
-        return pandas.read_json(text).to_xarray()
\ No newline at end of file
+        return pandas.read_json(text).to_xarray()
+
+    def to_bytes(self, value):
+        # netCDF3 has no 64 bit and unsigned integers, they would be converted
+        # to other types, those datasets are stored as text
+        for name, variable in value.variables.items():
+            dtype = variable.dtype
+            if dtype.kind == 'u' or (dtype.kind == 'i' and dtype.itemsize > 4):
+                raise ValueError(f'{dtype} of "{name}" is not supported by '
+                                 'netCDF3')
+        return bytes(value.to_netcdf())
+
+    def from_bytes(self, data):
+        import xarray
+        with xarray.open_dataset(io.BytesIO(bytes(data))) as dataset:
+            return dataset.load()
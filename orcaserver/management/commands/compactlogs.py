@@ -0,0 +1,84 @@
+import os
+import gzip
+import json
+from django.core.management.base import BaseCommand
+from django.conf import settings
+
+from orcaserver.models import Run, LogEntry
+
+# levels kept in compacted logs
+KEEP_LEVELS = ['INFO', 'ERROR']
+
+
+class Command(BaseCommand):
+    help = ('Reduce the logs of older runs of the scenarios to INFO and ERROR '
+            'entries and move the logs of even older runs to compressed files')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep', type=int, default=settings.ORCA_LOG_KEEP_RUNS,
+            help='number of the last runs per scenario with full logs')
+        parser.add_argument(
+            '--archive-after', type=int,
+            default=settings.ORCA_LOG_ARCHIVE_RUNS,
+            help='number of the last runs per scenario with logs in the '
+            'database, the logs of older runs are archived')
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='max. number of entries deleted at once')
+
+    def handle(self, *args, **options):
+        """handle the command"""
+        self.batch_size = options['batch_size']
+        scenario_ids = Run.objects.values_list(
+            'scenario', flat=True).distinct()
+        for scenario_id in scenario_ids:
+            runs = Run.objects.filter(scenario=scenario_id).order_by(
+                '-started')
+            for i, run in enumerate(runs):
+                # running
+                if not run.finished:
+                    continue
+                if i >= options['archive_after'] and not run.archive:
+                    self.archive(run)
+                elif i >= options['keep'] and not run.compacted:
+                    self.compact(run)
+
+    def _delete(self, entries):
+        # delete in batches to keep the locks short
+        while True:
+            pks = list(entries.values_list('pk', flat=True)[:self.batch_size])
+            if not pks:
+                break
+            LogEntry.objects.filter(pk__in=pks).delete()
+
+    def compact(self, run: Run):
+        self._delete(LogEntry.objects.filter(run=run).exclude(
+            level__in=KEEP_LEVELS))
+        run.compacted = True
+        run.save(update_fields=['compacted'])
+        self.stdout.write(f'compacted log of run {run.id} '
+                          f'(scenario {run.scenario_id})')
+
+    def archive(self, run: Run):
+        entries = LogEntry.objects.filter(run=run)
+        directory = os.path.join(settings.ORCA_LOG_ARCHIVE_DIR,
+                                 f'scenario_{run.scenario_id}')
+        os.makedirs(directory, exist_ok=True)
+        fp = os.path.join(directory, f'run_{run.id}.jsonl.gz')
+        with gzip.open(fp, 'wt', encoding='utf-8') as f:
+            for entry in entries.order_by('id').iterator(
+                    chunk_size=self.batch_size):
+                f.write(json.dumps({
+                    'seq': entry.seq,
+                    'timestamp': entry.timestamp.isoformat(),
+                    'level': entry.level,
+                    'message': entry.message,
+                    'status': entry.status,
+                }) + '\n')
+        self._delete(entries)
+        run.archive = fp
+        run.compacted = True
+        run.save(update_fields=['archive', 'compacted'])
+        self.stdout.write(f'archived log of run {run.id} '
+                          f'(scenario {run.scenario_id}) to {fp}')
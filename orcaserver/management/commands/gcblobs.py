@@ -0,0 +1,37 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.utils import timezone
+
+from orcaserver.models import ValueBlob
+
+
+class Command(BaseCommand):
+    help = ('Delete the blobs of the value store that are not referenced by '
+            'any injectable anymore')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours', type=float,
+            default=settings.ORCA_BLOB_GRACE_HOURS,
+            help='only blobs not used for this number of hours are deleted')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='max. number of blobs deleted at once')
+
+    def handle(self, *args, **options):
+        """handle the command"""
+        # blobs written right now might not be referenced yet
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+        orphans = ValueBlob.objects.filter(
+            injectable__isnull=True, last_used__lt=cutoff)
+        deleted = 0
+        while True:
+            pks = list(orphans.values_list('pk', flat=True)[
+                :options['batch_size']])
+            if not pks:
+                break
+            n, _ = ValueBlob.objects.filter(
+                pk__in=pks, injectable__isnull=True).delete()
+            deleted += n
+        self.stdout.write(f'deleted {deleted} unreferenced blobs')
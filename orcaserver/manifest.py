@@ -0,0 +1,250 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import importlib
+
+from .injectables import OrcaTypeMap
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 3
+
+
+def source_paths(module_names) -> tuple:
+    '''
+    source files of the given modules, the directory of the package a module
+    belongs to or the file of a top-level single-file module (e.g. in the
+    project root or site-packages, whose directories contain other modules)
+
+    Returns
+    -------
+    tuple
+        the paths (directories and files) and the names of the packages and
+        modules they contain
+    '''
+    paths = set()
+    packages = set()
+    for module_name in module_names:
+        spec = importlib.util.find_spec(module_name)
+        if not spec or not spec.origin:
+            continue
+        origin = os.path.abspath(spec.origin)
+        if spec.submodule_search_locations is not None:
+            paths.add(os.path.dirname(origin))
+            packages.add(module_name)
+        elif '.' in module_name:
+            paths.add(os.path.dirname(origin))
+            packages.add(module_name.rpartition('.')[0])
+        else:
+            paths.add(origin)
+            packages.add(module_name)
+    return sorted(paths), sorted(packages)
+
+
+def fingerprint(paths, known: dict = None):
+    '''
+    fingerprint of the python source files below the given directories and of
+    the given files
+
+    Parameters
+    ----------
+    paths : list of str
+    known : dict, optional
+        state of the files returned by a previous call, the files with
+        unchanged modification time and size are not hashed again
+
+    Returns
+    -------
+    tuple
+        the fingerprint and the state of the files
+        (path -> [mtime in ns, size, hash])
+    '''
+    known = known or {}
+    state = {}
+
+    def add_file(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        prev = known.get(path)
+        if prev and prev[0] == stat.st_mtime_ns and prev[1] == stat.st_size:
+            state[path] = prev
+            return
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        state[path] = [stat.st_mtime_ns, stat.st_size, digest]
+
+    for source in paths:
+        if not os.path.isdir(source):
+            add_file(source)
+            continue
+        for root, dirs, files in os.walk(source):
+            dirs[:] = [d for d in dirs if d != '__pycache__']
+            for fn in files:
+                if fn.endswith('.py'):
+                    add_file(os.path.join(root, fn))
+    combined = hashlib.sha256()
+    for path in sorted(state):
+        combined.update(f'{path}:{state[path][2]}\n'.encode())
+    return combined.hexdigest(), state
+
+
+def source_state(module_names) -> dict:
+    '''
+    paths, packages, fingerprint and file states of the sources of modules
+    (see source_paths)
+    '''
+    paths, packages = source_paths(module_names)
+    fp, state = fingerprint(paths)
+    return {'paths': paths, 'packages': packages, 'fingerprint': fp,
+            'files': state}
+
+
+def manifest_path(module_path: str, directories: list = None) -> str:
+    '''
+    path of the manifest file of the module, next to the module (in its
+    __pycache__) or in ORCA_MANIFEST_DIR if that is not writable
+    '''
+    fn = f'{module_path}.orca-manifest.json'
+    spec = importlib.util.find_spec(module_path)
+    if spec and spec.origin:
+        cache_dir = os.path.join(os.path.dirname(spec.origin), '__pycache__')
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            if os.access(cache_dir, os.W_OK):
+                return os.path.join(cache_dir, fn)
+        except OSError:
+            pass
+    from django.conf import settings
+    fallback = getattr(settings, 'ORCA_MANIFEST_DIR', None) or os.path.join(
+        tempfile.gettempdir(), 'orcadjango')
+    os.makedirs(fallback, exist_ok=True)
+    return os.path.join(fallback, fn)
+
+
+def _same_json(value, loaded) -> bool:
+    '''
+    True if the value loaded from json is equal to the original value and of
+    the same types (tuples are loaded as lists, dict keys as strings)
+    '''
+    if type(value) is not type(loaded):
+        return False
+    if isinstance(value, dict):
+        return (list(value) == list(loaded) and
+                all(_same_json(v, loaded[k]) for k, v in value.items()))
+    if isinstance(value, list):
+        return (len(value) == len(loaded) and
+                all(_same_json(v, l) for v, l in zip(value, loaded)))
+    return value == loaded
+
+
+def _dump_injectable(meta) -> dict:
+    '''
+    json-compatible copy of the meta data of an injectable, the default value
+    is converted to a string if it does not survive the json round trip
+    unchanged, None if not serializable
+    '''
+    meta = dict(meta)
+    default = meta.pop('default', None)
+    try:
+        if not _same_json(default, json.loads(json.dumps(default))):
+            raise ValueError('default changes in json')
+        meta['default'] = default
+    except (TypeError, ValueError):
+        conv = OrcaTypeMap.get(meta.get('data_class'))
+        meta['default_str'] = conv.to_str(default)
+    try:
+        json.dumps(meta)
+    except (TypeError, ValueError):
+        return None
+    return meta
+
+
+def _load_injectable(meta: dict) -> dict:
+    '''meta data of an injectable as stored by _dump_injectable'''
+    if 'default_str' in meta:
+        meta = dict(meta)
+        conv = OrcaTypeMap.get(meta.get('data_class'))
+        meta['default'] = conv.to_value(meta.pop('default_str'))
+    return meta
+
+
+def write_manifest(module_path: str, module_names, steps: dict,
+                   injectables: dict, dynamic, dependencies: dict,
+                   sources: dict = None):
+    '''
+    store the meta data of the steps and injectables of a loaded module
+    together with the fingerprint of its source files (as returned by
+    source_state, determined from the module names if not passed)
+    '''
+    try:
+        sources = sources or source_state(module_names)
+        dynamic = set(dynamic)
+        dumped = {}
+        for name, meta in injectables.items():
+            inj_meta = _dump_injectable(meta)
+            # not serializable, computed from the module on request
+            if inj_meta is None:
+                dynamic.add(name)
+                inj_meta = {'hidden': True} if meta.get('hidden') else {}
+            dumped[name] = inj_meta
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'module': module_path,
+            'paths': sources['paths'],
+            'packages': sources['packages'],
+            'fingerprint': sources['fingerprint'],
+            'files': sources['files'],
+            'steps': {name: dict(meta) for name, meta in steps.items()},
+            'injectables': dumped,
+            'dynamic': sorted(dynamic),
+            'dependencies': {name: list(parents)
+                             for name, parents in dependencies.items()},
+        }
+        fn = manifest_path(module_path)
+        tmp = f'{fn}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp, fn)
+    except (OSError, TypeError, ValueError) as e:
+        logger.warning(f'Could not write the manifest of {module_path}: {e}')
+
+
+def read_manifest(module_path: str) -> dict:
+    '''
+    read the manifest of a module, returns None if there is none or if the
+    source files changed since it was written
+    '''
+    try:
+        with open(manifest_path(module_path)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return
+    if (manifest.get('version') != MANIFEST_VERSION or
+            manifest.get('module') != module_path):
+        return
+    fp, state = fingerprint(manifest['paths'], known=manifest['files'])
+    if fp != manifest['fingerprint']:
+        return
+    dynamic = set(manifest['dynamic'])
+    injectables = {}
+    for name, meta in manifest['injectables'].items():
+        try:
+            injectables[name] = _load_injectable(meta)
+        except Exception:
+            injectables[name] = {'hidden': True} if meta.get('hidden') \
+                else {}
+            dynamic.add(name)
+    return {
+        'steps': manifest['steps'],
+        'injectables': injectables,
+        'dynamic': dynamic,
+        'dependencies': manifest['dependencies'],
+        'files': state,
+        'fingerprint': fp,
+        'paths': manifest['paths'],
+        'packages': manifest['packages'],
+    }
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orcaserver', '0034_logentry_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='logentry',
+            index=models.Index(fields=['scenario', 'id'], name='logentry_scenario_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logentry',
+            index=models.Index(fields=['scenario', 'level', 'id'], name='logentry_scen_level_id_idx'),
+        ),
+    ]
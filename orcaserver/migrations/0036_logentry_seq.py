@@ -0,0 +1,32 @@
+# Generated by Django 4.2.16 on 2026-10-18 10:05
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def number_existing_entries(apps, schema_editor):
+    # the ids are increasing, so they serve as sequence numbers of the
+    # already existing entries
+    LogEntry = apps.get_model('orcaserver', 'LogEntry')
+    LogEntry.objects.update(seq=F('id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orcaserver', '0035_logentry_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logentry',
+            name='seq',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.RunPython(number_existing_entries,
+                             migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='logentry',
+            index=models.Index(fields=['scenario', 'seq'], name='logentry_scenario_seq_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.16 on 2026-10-18 11:20
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def assign_runs(apps, schema_editor):
+    # until now there was only one run per scenario
+    LogEntry = apps.get_model('orcaserver', 'LogEntry')
+    Run = apps.get_model('orcaserver', 'Run')
+    run = Run.objects.filter(scenario=OuterRef('scenario')).order_by('id')
+    LogEntry.objects.update(run=Subquery(run.values('id')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orcaserver', '0036_logentry_seq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='run',
+            name='archive',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='compacted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='logentry',
+            name='run',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='orcaserver.run'),
+        ),
+        migrations.RunPython(assign_runs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.16 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orcaserver', '0037_run_logs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='injectable',
+            name='blob',
+            field=models.BinaryField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='injectable',
+            name='blob_format',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.16 on 2026-10-18 15:30
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations
+
+
+def wkt_to_geom(apps, schema_editor):
+    from django.contrib.gis.gdal import OGRGeometry, GDALException
+    Injectable = apps.get_model('orcaserver', 'Injectable')
+    injectables = Injectable.objects.filter(
+        datatype__iexact='geometry', geom__isnull=True).exclude(
+            value__isnull=True).exclude(value='')
+    for inj in injectables.iterator(chunk_size=100):
+        try:
+            ogr_geom = OGRGeometry(inj.value)
+        except GDALException:
+            continue
+        ogr_geom.coord_dim = 2
+        geom = ogr_geom.geos
+        geom.srid = 4326
+        inj.geom = geom
+        inj.value = None
+        inj.save(update_fields=['geom', 'value'])
+
+
+def geom_to_wkt(apps, schema_editor):
+    Injectable = apps.get_model('orcaserver', 'Injectable')
+    injectables = Injectable.objects.filter(geom__isnull=False)
+    for inj in injectables.iterator(chunk_size=100):
+        inj.value = inj.geom.wkt
+        inj.geom = None
+        inj.save(update_fields=['geom', 'value'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orcaserver', '0038_injectable_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='injectable',
+            name='geom',
+            field=django.contrib.gis.db.models.fields.GeometryField(
+                blank=True, null=True, srid=4326),
+        ),
+        migrations.RunPython(wkt_to_geom, geom_to_wkt),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.16 on 2026-10-18 16:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orcaserver', '0039_injectable_geom'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ValueBlob',
+            fields=[
+                ('hash', models.CharField(max_length=64, primary_key=True,
+                                          serialize=False)),
+                ('data', models.BinaryField()),
+                ('size', models.BigIntegerField(default=0)),
+                ('last_used', models.DateTimeField(
+                    default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='injectable',
+            name='value_ref',
+            field=models.ForeignKey(
+                blank=True, null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                to='orcaserver.valueblob'),
+        ),
+    ]
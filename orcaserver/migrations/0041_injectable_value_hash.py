@@ -0,0 +1,34 @@
+# Generated by Django 4.2.16 on 2026-10-18 17:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orcaserver', '0040_valueblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='injectable',
+            name='value_hash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.RunSQL(
+            sql=[
+                "UPDATE orcaserver_injectable "
+                "SET value_hash = encode(sha256(convert_to(value, 'UTF8')), "
+                "'hex') WHERE value IS NOT NULL",
+                "UPDATE orcaserver_injectable SET value_hash = value_ref_id "
+                "WHERE value IS NULL AND value_ref_id IS NOT NULL "
+                "AND blob_format IS NULL",
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='injectable',
+            index=models.Index(fields=['name', 'value_hash'],
+                               name='injectable_name_hash_idx'),
+        ),
+    ]
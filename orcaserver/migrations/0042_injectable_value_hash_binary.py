@@ -0,0 +1,29 @@
+# Generated by Django 4.2.16 on 2026-10-18 19:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orcaserver', '0041_injectable_value_hash'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                "UPDATE orcaserver_injectable SET value_hash = value_ref_id "
+                "WHERE value IS NULL AND value_ref_id IS NOT NULL "
+                "AND blob_format IS NOT NULL",
+                "UPDATE orcaserver_injectable "
+                "SET value_hash = encode(sha256(blob), 'hex') "
+                "WHERE value IS NULL AND value_ref_id IS NULL "
+                "AND blob IS NOT NULL",
+                "UPDATE orcaserver_injectable "
+                "SET value_hash = encode(sha256(ST_AsBinary(geom)), 'hex') "
+                "WHERE value IS NULL AND value_ref_id IS NULL "
+                "AND blob IS NULL AND geom IS NOT NULL",
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -1,15 +1,30 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 import json
+import copy
+import hashlib
+from django.utils import timezone
 from django.core.validators import int_list_validator
 from django.core.exceptions import ObjectDoesNotExist
 
 from .injectables import OrcaTypeMap
+from .cache import LRUCache
 from .orca import OrcaManager
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.gis.db import models as gis_models
+from django.contrib.gis.geos import GEOSGeometry
+
+
+# serialized values of derived injectables by module, injectable name and
+# values of the parent injectables
+derived_values = LRUCache(getattr(settings, 'ORCA_DERIVED_CACHE_SIZE', 1000))
+_NOT_CALCULATED = object()
+# deserialized values of the blob store by blob hash and data class, shared by
+# all scenarios
+decoded_values = LRUCache(getattr(settings, 'ORCA_BLOB_CACHE_SIZE', 100))
 
 
 class NameModel(models.Model):
@@ -65,51 +80,107 @@ class Scenario(NameModel):
 
     def recreate_injectables(self, keep_values=False):
         '''
-        function to create or reset injectables of scenario
+        function to create or reset injectables of scenario, the number of
+        queries does not depend on the number of injectables. only the
+        changed fields of changed injectables are written
         '''
         orca_manager = OrcaManager(self.project.module)
-        inj_names = orca_manager.get_injectable_names()
         descriptors = {}
-        for name in inj_names:
-            descriptors[name] = orca_manager.get_injectable_meta(name)
-        project = self.project
-        init_values = json.loads(project.init)
-        valid_inj = []
-        # create or reset injectables
-        for name, desc in descriptors.items():
-            if not desc or desc.get('hidden'):
-                continue
-            valid_inj.append(name)
-            inj, created = Injectable.objects.get_or_create(name=name,
-                                                            scenario=self)
-            value = init_values.get(name)
-            if not value:
-                conv = OrcaTypeMap.get(desc['data_class'])
-                value = conv.to_str(desc.get('default'))
-            if created or not keep_values:
-                inj.value = value
-            inj.datatype = desc['datatype']
-            inj.data_class = desc['data_class']
-            inj.save()
-        # add parent injectable ids
-        for name, desc in descriptors.items():
-            if not desc or desc.get('hidden'):
-                continue
-            parent_injectables = []
-            inj = self.injectable_set.get(name=name)
-            for parameter in desc.get('parameters', []):
-                try:
-                    parent_inj = self.injectable_set.get(name=parameter)
-                    parent_injectables.append(parent_inj.pk)
-                except Injectable.DoesNotExist:
-                    pass
-                    #orca.logger.warn(f'Injectable {parameter} '
-                                     #f'not found in scenario {inj.scenario.name}')
-            inj.parent_injectables = str(parent_injectables)
-            inj.save()
-        # remove outdated injectables that are not defined by the module anymore
-        remove = Injectable.objects.filter(scenario=self).exclude(name__in=valid_inj)
-        remove.delete()
+        for name in orca_manager.get_injectable_names():
+            desc = orca_manager.get_injectable_meta(name)
+            if desc and not desc.get('hidden'):
+                descriptors[name] = desc
+        init_values = json.loads(self.project.init)
+        value_fields = ('value', 'value_hash', 'blob', 'blob_format', 'geom',
+                        'value_ref')
+        with transaction.atomic():
+            existing = {inj.name: inj for inj in
+                        Injectable.objects.select_for_update().filter(
+                            scenario=self)}
+            created = []
+            injectables = []
+            # fields to update per existing injectable
+            changed = {}
+            # create or reset injectables
+            for name, desc in descriptors.items():
+                inj = existing.get(name)
+                reset = inj is None or not keep_values
+                if inj is None:
+                    inj = Injectable(name=name, scenario=self)
+                    created.append(inj)
+                fields = changed.setdefault(name, set())
+                for attr in ('datatype', 'data_class'):
+                    if getattr(inj, attr) != desc[attr]:
+                        setattr(inj, attr, desc[attr])
+                        fields.add(attr)
+                if reset:
+                    stored = (inj.value_hash, inj.blob_format)
+                    value = init_values.get(name)
+                    if value:
+                        inj.set_text(value)
+                    else:
+                        inj.set_value(desc.get('default'))
+                    inj.update_hash()
+                    # the hash covers text, binary and spatial values
+                    if (inj.value_hash, inj.blob_format) != stored:
+                        fields.update(value_fields)
+                injectables.append(inj)
+            ValueBlob.store(inj._pending_blob for inj in injectables
+                            if inj._pending_blob)
+            Injectable.objects.bulk_create(created)
+            for inj in created:
+                changed[inj.name] = set()
+            # add parent injectable ids
+            pks = {inj.name: inj.pk for inj in injectables}
+            for inj in injectables:
+                parameters = descriptors[inj.name].get('parameters', [])
+                parents = str([pks[p] for p in parameters if p in pks])
+                if parents != inj.parent_injectables:
+                    inj.parent_injectables = parents
+                    changed[inj.name].add('parent_injectables')
+            # update only the changed fields of the changed injectables, one
+            # query per combination of changed fields
+            by_fields = {}
+            for inj in injectables:
+                fields = changed[inj.name]
+                if fields:
+                    by_fields.setdefault(frozenset(fields), []).append(inj)
+            for fields, changed_injectables in by_fields.items():
+                Injectable.objects.bulk_update(changed_injectables,
+                                               sorted(fields))
+            # remove outdated injectables that are not defined by the module
+            # anymore
+            Injectable.objects.filter(scenario=self).exclude(
+                name__in=list(descriptors)).delete()
+
+
+class ValueBlob(models.Model):
+    '''
+    store for large values of injectables, addressed by the hash of their
+    content. equal values of different injectables are stored only once
+    '''
+    hash = models.CharField(max_length=64, primary_key=True)
+    data = models.BinaryField()
+    size = models.BigIntegerField(default=0)
+    # blobs not referenced anymore are deleted some time after their last use
+    # (see management command "gcblobs")
+    last_used = models.DateTimeField(default=timezone.now)
+
+    @staticmethod
+    def create(data: bytes) -> 'ValueBlob':
+        '''blob for the data (not saved)'''
+        return ValueBlob(hash=hashlib.sha256(data).hexdigest(), data=data,
+                         size=len(data), last_used=timezone.now())
+
+    @staticmethod
+    def store(blobs):
+        '''save the blobs, existing ones are only marked as used'''
+        blobs = list({blob.hash: blob for blob in blobs}.values())
+        if not blobs:
+            return
+        ValueBlob.objects.bulk_create(
+            blobs, update_conflicts=True, unique_fields=['hash'],
+            update_fields=['last_used'])
 
 
 class Injectable(NameModel):
@@ -120,11 +191,82 @@ class Injectable(NameModel):
     data_class = models.TextField(null=True, blank=True)
     parent_injectables = models.TextField(
         validators=[int_list_validator], default='[]')
+    # value in the binary format of the converter (if it has one), "value"
+    # is empty then
+    blob = models.BinaryField(null=True, editable=False)
+    blob_format = models.TextField(null=True, blank=True)
+    # value of geometry injectables (converters with "spatial" flag), "value"
+    # is empty then
+    geom = gis_models.GeometryField(srid=4326, null=True, blank=True,
+                                    spatial_index=True)
+    # large values are moved to the blob store, "value" and "blob" are empty
+    # then ("blob_format" is kept)
+    value_ref = models.ForeignKey(ValueBlob, null=True, blank=True,
+                                  on_delete=models.PROTECT)
+    # hash of the stored value (text, binary or geometry), used to check the
+    # uniqueness of values and to detect changed values
+    value_hash = models.CharField(max_length=64, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['name', 'value_hash'],
+                         name='injectable_name_hash_idx'),
+        ]
+
+    @staticmethod
+    def hash_value(value) -> str:
+        '''hash of the text representation of a value'''
+        text = value if isinstance(value, str) else str(value)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    @staticmethod
+    def hash_text(data_class: str, text) -> str:
+        '''hash of the value the text is stored as for the data class'''
+        inj = Injectable(data_class=data_class)
+        inj.set_text(text if isinstance(text, str) else str(text))
+        inj.update_hash()
+        return inj.value_hash
+
+    def update_hash(self):
+        '''
+        update the hash of the value, text and binary values are hashed by
+        their stored content, geometries by their WKB
+        '''
+        if self.value is not None:
+            self.value_hash = Injectable.hash_value(self.value)
+        # moved to the blob store, addressed by the hash of the content
+        elif self.value_ref_id:
+            self.value_hash = self.value_ref_id
+        elif self.blob is not None:
+            self.value_hash = hashlib.sha256(bytes(self.blob)).hexdigest()
+        elif self.geom is not None:
+            self.value_hash = hashlib.sha256(
+                bytes(self.geom.wkb)).hexdigest()
+        else:
+            self.value_hash = None
 
     def __init__(self, *args, **kwargs):
         self.__meta = kwargs.pop('meta', None)
+        # parent injectables, see prefetch_parents
+        self._parent_objects = None
+        self._derived = _NOT_CALCULATED
+        # blob of the value not saved yet
+        self._pending_blob = None
+        # text value from the blob store, see prefetch_blobs
+        self._ref_text = None
         super().__init__(*args, **kwargs)
 
+    def save(self, *args, **kwargs):
+        if self._pending_blob:
+            ValueBlob.store([self._pending_blob])
+            self._pending_blob = None
+        self.update_hash()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {
+                'value', 'blob', 'geom', 'value_ref'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'value_hash'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f'{self.scenario} - {self.name}'
 
@@ -138,8 +280,12 @@ class Injectable(NameModel):
             return dummy
         try:
             manager = OrcaManager(self.scenario.project.module)
-            orca = manager.get_instance(self.scenario.orca_id)
-            meta = manager.get_injectable_meta(self.name, instance=orca.orca) or dummy
+            # only injectables refreshed on request need the scenario instance
+            instance = None
+            if self.name in manager.index.dynamic:
+                instance = manager.get_instance(self.scenario.orca_id).orca
+            meta = manager.get_injectable_meta(
+                self.name, instance=instance) or dummy
         # there is a rare possibility that scenario is deleted right at this moment.
         # injectable will follow but there is a short period where this might
         # cause an exception
@@ -163,20 +309,234 @@ class Injectable(NameModel):
             return False
         return True
 
+    @staticmethod
+    def prefetch_parents(injectables):
+        '''
+        fetch the parents of the given injectables in a single query, parents
+        contained in the given injectables are taken from there
+        '''
+        injectables = list(injectables)
+        by_pk = {inj.pk: inj for inj in injectables}
+        missing = {pk for inj in injectables for pk in inj.parents
+                   if pk not in by_pk}
+        if missing:
+            by_pk.update(Injectable.objects.in_bulk(missing))
+        for inj in injectables:
+            inj._parent_objects = [by_pk[pk] for pk in inj.parents
+                                   if pk in by_pk]
+            # parents belong to the same scenario
+            for parent in inj._parent_objects:
+                if parent.scenario_id == inj.scenario_id:
+                    parent.scenario = inj.scenario
+
+    @staticmethod
+    def prefetch_blobs(injectables):
+        '''
+        fetch the text values of the given injectables moved to the blob
+        store in a single query
+        '''
+        injectables = [inj for inj in injectables
+                       if inj.value_ref_id and not inj.blob_format]
+        if not injectables:
+            return
+        data = dict(ValueBlob.objects.filter(
+            pk__in={inj.value_ref_id for inj in injectables}).values_list(
+                'pk', 'data'))
+        for inj in injectables:
+            blob = data.get(inj.value_ref_id)
+            if blob is not None:
+                inj._ref_text = bytes(blob).decode()
+
+    @staticmethod
+    def evaluate_derived(injectables):
+        '''
+        calculate the values of the derived injectables of a scenario in a
+        single pass in topological order of the dependency graph of the
+        module, so that derived parents are calculated before their children
+        '''
+        injectables = list(injectables)
+        if not injectables:
+            return
+        Injectable.prefetch_parents(injectables)
+        index = OrcaManager(injectables[0].scenario.project.module).index
+        rank = {name: i for i, name in enumerate(index.order)}
+        for inj in sorted(injectables, key=lambda i: rank.get(i.name, -1)):
+            inj.derived_value
+
     @property
     def derived_value(self):
-        parents = self.parents
-        if not parents:
+        '''
+        value calculated from the (derived) values of the parents, cached by
+        the values of the parents
+        '''
+        if not self.parents:
             return self.value
-        values = [Injectable.objects.get(id=p_id).deserialized_value
-                  for p_id in parents]
-        conv = OrcaTypeMap.get(self.data_class)
+        if self._derived is not _NOT_CALCULATED:
+            return self._derived
+        if self._parent_objects is None:
+            Injectable.prefetch_parents([self])
+        parents = self._parent_objects
+        manager = OrcaManager(self.scenario.project.module)
+        # the value only depends on the values of the parents (and the code of
+        # the module)
+        parent_hash = hashlib.sha1(json.dumps(
+            [(p.name, p.value_token) for p in parents]).encode()).hexdigest()
+        key = (manager.module, manager.version, self.name, parent_hash)
+        value = derived_values.get(key)
+        if value is None:
+            values = [p.current_value for p in parents]
+            conv = OrcaTypeMap.get(self.data_class)
+            try:
+                value = conv.to_str(
+                    manager.get_calculated_value(self.name, *values))
+            except KeyError:
+                value = None
+            if value is not None:
+                derived_values.set(key, value)
+        self._derived = value
+        return value
+
+    @property
+    def value_token(self):
+        '''
+        identifies the current value, the text of the (derived) value or the
+        hash of the binary value
+        '''
+        if self.parents:
+            return self.derived_value
+        if self.value_ref_id:
+            return f'ref:{self.value_ref_id}'
+        if self.blob is not None:
+            return f'{self.blob_format}:{hashlib.md5(self.blob).hexdigest()}'
+        if self.geom is not None:
+            return f'wkb:{hashlib.md5(self.geom.wkb).hexdigest()}'
+        return self.value
+
+    @property
+    def current_value(self):
+        '''deserialized (derived) value'''
+        if not self.parents:
+            return self.deserialized_value
         try:
-            value = OrcaManager(self.scenario.project.module
-                                ).get_calculated_value(self.name, *values)
-        except KeyError:
+            return OrcaTypeMap.get(self.data_class).to_value(
+                self.derived_value)
+        except Exception:
+            return
+
+    def set_value(self, value):
+        '''
+        set the value, stored in binary format if the converter of the
+        injectable has one, as text otherwise
+        '''
+        conv = OrcaTypeMap.get(self.data_class)
+        self.blob = self.blob_format = self.geom = None
+        self.value_ref = self._ref_text = None
+        if conv.spatial:
+            wkb = conv.to_wkb(value)
+            self.geom = GEOSGeometry(memoryview(wkb), srid=conv.srid) \
+                if wkb else None
+            self.value = None
+        else:
+            if conv.binary_format and value is not None:
+                try:
+                    self.blob = conv.to_bytes(value)
+                    self.blob_format = conv.binary_format
+                except conv.binary_errors:
+                    # not representable in the binary format, store as text
+                    pass
+            self.value = None if self.blob_format else conv.to_str(value)
+        self._externalize()
+
+    def set_text(self, text: str):
+        '''set the value from its text representation'''
+        conv = OrcaTypeMap.get(self.data_class)
+        if (conv.binary_format or conv.spatial) and text:
+            self.set_value(conv.to_value(text))
+        else:
+            self.value = text
+            self.blob = self.blob_format = self.geom = None
+            self.value_ref = self._ref_text = None
+            self._externalize()
+
+    def _externalize(self):
+        '''
+        move a value larger than ORCA_BLOB_THRESHOLD bytes to the blob store,
+        saved together with the injectable
+        '''
+        if self.blob is not None:
+            data = bytes(self.blob)
+        elif self.value:
+            data = str(self.value).encode()
+        else:
             return
-        return conv.to_str(value)
+        if len(data) < getattr(settings, 'ORCA_BLOB_THRESHOLD', 65536):
+            return
+        self._pending_blob = ValueBlob.create(data)
+        self.value_ref_id = self._pending_blob.hash
+        self.value = self.blob = None
+
+    def _load_ref(self, conv):
+        '''
+        deserialized value from the blob store, the decoded values are cached
+        and copied on return
+        '''
+        key = (self.value_ref_id, self.data_class)
+        value = decoded_values.get(key, _NOT_CALCULATED)
+        if value is _NOT_CALCULATED:
+            data = ValueBlob.objects.filter(pk=self.value_ref_id).values_list(
+                'data', flat=True).first()
+            if data is None:
+                return
+            if self.blob_format:
+                if self.blob_format != conv.binary_format:
+                    return
+                value = conv.from_bytes(data)
+            else:
+                value = conv.to_value(bytes(data).decode())
+            decoded_values.set(key, value)
+        # the instances might change the values in place
+        return copy.deepcopy(value)
+
+    @property
+    def text_value(self):
+        '''text representation of the value (not derived)'''
+        # stored in 2D already
+        if self.geom is not None:
+            return self.geom.wkt
+        if self.value_ref_id and not self.blob_format:
+            if self._ref_text is not None:
+                return self._ref_text
+            data = ValueBlob.objects.filter(pk=self.value_ref_id).values_list(
+                'data', flat=True).first()
+            return bytes(data).decode() if data is not None else None
+        if self.blob is None and not self.value_ref_id:
+            return self.value
+        conv = OrcaTypeMap.get(self.data_class)
+        return conv.to_str(self.deserialized_value)
+
+    def invalidate_downstream(self):
+        '''
+        recalculate the injectables of the scenario depending on this one
+        (after its value changed) and store their values
+        '''
+        index = OrcaManager(self.scenario.project.module).index
+        downstream = index.downstream([self.name])
+        if not downstream:
+            return []
+        injectables = list(Injectable.objects.filter(
+            scenario=self.scenario_id, name__in=downstream).select_related(
+                'scenario__project'))
+        Injectable.evaluate_derived(injectables)
+        for inj in injectables:
+            # stored like the defaults (binary, geometry or blob store)
+            inj.set_text(inj.derived_value)
+            inj.update_hash()
+        ValueBlob.store(inj._pending_blob for inj in injectables
+                        if inj._pending_blob)
+        Injectable.objects.bulk_update(
+            injectables, ['value', 'value_hash', 'blob', 'blob_format', 'geom',
+                          'value_ref'])
+        return injectables
 
     # can unfortunatelly not be put into serializer field
     # (serialization usually happens first/last on request,
@@ -185,6 +545,13 @@ class Injectable(NameModel):
     def deserialized_value(self):
         conv = OrcaTypeMap.get(self.data_class)
         try:
+            if self.value_ref_id:
+                return self._load_ref(conv)
+            if self.blob is not None and \
+                    self.blob_format == conv.binary_format:
+                return conv.from_bytes(self.blob)
+            if self.geom is not None and conv.spatial:
+                return conv.from_wkb(self.geom.wkb)
             value = conv.to_value(self.value)
         except:
             return
@@ -193,11 +560,11 @@ class Injectable(NameModel):
     # can unfortunatelly not be put into custom (writable) serializer field
     @property
     def serialized_value(self):
-        value = self.derived_value if self.parents else self.value
+        value = self.derived_value if self.parents else self.text_value
         if value is None:
             return
-        # force flattening to 2D for geometries (very clunky)
-        if self.datatype.lower() == 'geometry':
+        # force flattening to 2D for geometries stored as text (very clunky)
+        if self.datatype.lower() == 'geometry' and self.geom is None:
             conv = OrcaTypeMap.get(self.data_class)
             return conv.to_str(conv.to_value(value))
         try:
@@ -222,10 +589,24 @@ class Step(NameModel):
 
 class LogEntry(models.Model):
     scenario = models.ForeignKey(Scenario, on_delete=models.CASCADE)
+    run = models.ForeignKey('Run', on_delete=models.CASCADE, null=True)
     message = models.TextField(blank=True)
     level = models.TextField(default='INFO')
     timestamp = models.DateTimeField()
     status = models.JSONField(null=True, blank=True)
+    # sequence number of the entry inside the log of the scenario
+    seq = models.BigIntegerField(null=True)
+
+    class Meta:
+        # keyset pagination of the log of a scenario
+        indexes = [
+            models.Index(fields=['scenario', 'id'],
+                         name='logentry_scenario_id_idx'),
+            models.Index(fields=['scenario', 'level', 'id'],
+                         name='logentry_scen_level_id_idx'),
+            models.Index(fields=['scenario', 'seq'],
+                         name='logentry_scenario_seq_idx'),
+        ]
 
 
 class Run(models.Model):
@@ -235,6 +616,10 @@ class Run(models.Model):
     success = models.BooleanField(default=False)
     run_by = models.ForeignKey(settings.AUTH_USER_MODEL,
                                on_delete=models.SET_NULL, null=True)
+    # log reduced to INFO and ERROR entries
+    compacted = models.BooleanField(default=False)
+    # path to the file the log was moved to
+    archive = models.TextField(blank=True, default='')
 
 
 class Avatar(models.Model):
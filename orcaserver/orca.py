@@ -1,23 +1,48 @@
 import os
 import threading
+import time
 import importlib
 import logging
 import ctypes
 import sys
 import typing
+import pickle
+import multiprocessing
+import multiprocessing.util
+from collections import deque
+from queue import Empty, Queue
+from types import MappingProxyType
+from graphlib import TopologicalSorter, CycleError
 from inspect import signature, _empty
 import traceback
 
 from django.utils import timezone
+from django.utils.module_loading import import_string
 from django.utils.translation import gettext as _
 
+from .manifest import (read_manifest, write_manifest, source_state,
+                       fingerprint)
+
 lock = threading.Lock()
+# loading a module swaps sys.modules['orca'], only one load at a time
+load_lock = threading.RLock()
+# threads warming up modules in the background
+_warmup_local = threading.local()
 
 _CS_STEP = 'steps'
 _CS_ITER = 'iteration'
 
 logger = logging.getLogger('scenario')
 
+# set in worker processes of the ProcessExecutor, those only run steps and
+# don't need the generic instances of the known modules
+IN_WORKER = False
+# fully loaded instances of modules preloaded by the fork server, inherited
+# copy-on-write by the forked worker processes
+_TEMPLATES = {}
+# state of the source files of the preloaded modules (see source_state)
+_TEMPLATE_SOURCES = {}
+
 def load_module(module_name, orca=None, module_set=None):
     if not orca:
         import orca
@@ -27,6 +52,8 @@ def load_module(module_name, orca=None, module_set=None):
         orca._injectable_backup = {}
         orca._injectable_function = {}
         module_set = {module_name}
+        # names of all loaded modules (incl. parent modules)
+        orca._module_set = module_set
 
     spec = importlib.util.find_spec(module_name)
     module = importlib.util.module_from_spec(spec)
@@ -48,6 +75,40 @@ def load_module(module_name, orca=None, module_set=None):
     return module
 
 
+def purge_modules(packages):
+    '''
+    remove the given packages and modules with their submodules from
+    sys.modules, so that they are imported from the (changed) sources on the
+    next load
+    '''
+    for name in list(sys.modules):
+        if name.split('.')[0] in ('orca', 'orcaserver', 'orcadjango'):
+            continue
+        if any(name == package or name.startswith(f'{package}.')
+               for package in packages):
+            del(sys.modules[name])
+
+
+def _get_template(module: str) -> 'OrcaWrapper':
+    '''
+    instance of the module preloaded by the fork server, None if there is
+    none or if the sources of the module changed since it was loaded
+    '''
+    wrapper = _TEMPLATES.pop(module, None)
+    sources = _TEMPLATE_SOURCES.pop(module, None)
+    if not wrapper or not sources:
+        return
+    fp, state = fingerprint(sources['paths'], known=sources['files'])
+    if fp != sources['fingerprint']:
+        purge_modules(sources['packages'])
+        return
+    return wrapper
+
+
+class ModuleNotReady(Exception):
+    '''the module is still loading'''
+
+
 class InUseError(Exception):
     ''''''
 
@@ -77,6 +138,248 @@ class AbortableThread(threading.Thread):
             print('Exception raise failure')
 
 
+class ThreadExecutor:
+    '''
+    runs the steps of an orca instance in an abortable thread inside of the
+    web process
+    '''
+
+    def __init__(self, wrapper: 'OrcaWrapper'):
+        self.wrapper = wrapper
+        self.thread = None
+
+    def start(self, steps, on_success=None, on_error=None):
+        self.thread = AbortableThread(
+            target=self.wrapper.run_steps, args=(steps, ),
+            kwargs={'on_success': on_success, 'on_error': on_error})
+        self.thread.start()
+
+    def abort(self):
+        self.thread.abort()
+
+    def is_running(self):
+        return self.thread.is_alive() if self.thread else False
+
+
+class _ProcessStep:
+    '''
+    stand-in for the Step model inside of a worker process,
+    the changes are passed to the web process on save
+    '''
+
+    def __init__(self, step_id: int, name: str, queue):
+        self.id = step_id
+        self.name = name
+        self.queue = queue
+        self.started = None
+        self.finished = None
+        self.success = False
+        self.active = True
+
+    def save(self):
+        self.queue.put(('step', self.id, {
+            'started': self.started,
+            'finished': self.finished,
+            'success': self.success,
+            'active': self.active,
+        }))
+
+
+class _ProcessLogHandler(logging.Handler):
+    '''passes the log records of a worker process to the web process'''
+
+    def __init__(self, queue):
+        super().__init__()
+        self.queue = queue
+
+    def emit(self, record):
+        self.queue.put(('log', record.levelno, record.getMessage(),
+                        getattr(record, 'status', None)))
+
+
+def _run_in_process(module: str, steps: list, values: list, queue):
+    '''
+    entry point of the worker processes of the ProcessExecutor, loads the
+    module, applies the values of the injectables and runs the steps
+    '''
+    global IN_WORKER
+    IN_WORKER = True
+    import django
+    django.setup()
+    from .injectables import OrcaTypeMap
+    wrapper = _get_template(module) or OrcaWrapper(module)
+    # the queue decouples the logging already, no need for the pipeline
+    wrapper.orca.logger.addHandler(_ProcessLogHandler(queue))
+    for name, pickled, data_class, text in values:
+        if pickled is not None:
+            value = pickle.loads(pickled)
+        else:
+            value = OrcaTypeMap.get(data_class).to_value(text)
+        wrapper.set_value(name, value)
+    steps = [_ProcessStep(step_id, name, queue) for step_id, name in steps]
+    result = []
+    wrapper.run_steps(steps,
+                      on_success=lambda: result.append(True),
+                      on_error=lambda: result.append(False))
+    if result:
+        queue.put(('done', result[0]))
+
+
+class ProcessExecutor:
+    '''
+    runs the steps of an orca instance in a separate worker process, so that
+    the computations don't compete with the web process for the GIL.
+    log records and step states are streamed back to the web process and
+    handled there by the handlers of the orca instance.
+    where available the workers are forked from a fork server that has the
+    known modules already loaded (see orcaserver.forkserver).
+    the workers are no daemons, so that steps can start processes themselves.
+    they are terminated explicitly on abort and when the web process exits
+    '''
+    start_method = 'forkserver'
+    # paths of the modules loaded by the fork server on its start
+    preload_modules = set()
+    # seconds to wait for a terminated worker before it is killed
+    terminate_timeout = 5
+    # worker processes currently running
+    workers = set()
+    _workers_lock = threading.Lock()
+
+    def __init__(self, wrapper: 'OrcaWrapper'):
+        self.wrapper = wrapper
+        self.process = None
+        self.listener = None
+
+    @property
+    def context(self):
+        if self.start_method not in multiprocessing.get_all_start_methods():
+            return multiprocessing.get_context('spawn')
+        context = multiprocessing.get_context(self.start_method)
+        if self.start_method == 'forkserver':
+            # the fork server inherits the environment on its (first) start,
+            # changes after that have no effect
+            os.environ['ORCA_PRELOAD_MODULES'] = ','.join(
+                sorted(self.preload_modules))
+            context.set_forkserver_preload(['orcaserver.forkserver'])
+        return context
+
+    def _transferable_values(self) -> list:
+        '''
+        values of the injectables set in the web process, values that can't be
+        pickled are passed as strings and converted back in the worker
+        '''
+        from .injectables import OrcaTypeMap
+        values = []
+        for name, value in self.wrapper.values.items():
+            try:
+                values.append((name, pickle.dumps(value), None, None))
+            except (pickle.PicklingError, TypeError, AttributeError):
+                data_class = (f'{type(value).__module__}.'
+                              f'{type(value).__name__}')
+                text = OrcaTypeMap.get(data_class).to_str(value)
+                values.append((name, None, data_class, text))
+        return values
+
+    def start(self, steps, on_success=None, on_error=None):
+        steps = list(steps)
+        queue = self.context.Queue()
+        self.process = self.context.Process(
+            target=_run_in_process,
+            args=(self.wrapper.module, [(s.id, s.name) for s in steps],
+                  self._transferable_values(), queue),
+            daemon=False)
+        self.process.start()
+        with self._workers_lock:
+            self.workers.add(self.process)
+        self.listener = threading.Thread(
+            target=self._listen, args=(queue, steps, on_success, on_error),
+            daemon=True)
+        self.listener.start()
+
+    def _listen(self, queue, steps, on_success=None, on_error=None):
+        orca_logger = self.wrapper.orca.logger
+        steps = {step.id: step for step in steps}
+        done = False
+        while not done:
+            try:
+                message = queue.get(timeout=0.5)
+            except Empty:
+                if not self.process.is_alive():
+                    break
+                continue
+            kind = message[0]
+            if kind == 'log':
+                level, text, status = message[1:]
+                extra = {'status': status} if status else None
+                orca_logger.log(level, text, extra=extra)
+            elif kind == 'step':
+                step = steps[message[1]]
+                for attr, value in message[2].items():
+                    setattr(step, attr, value)
+                step.save()
+            elif kind == 'done':
+                done = True
+                callback = on_success if message[1] else on_error
+                if callback:
+                    callback()
+        # process was terminated or died without finishing the run
+        if not done:
+            orca_logger.error(_('orca run aborted'), extra={
+                'status': {'finished': True, 'success': False}})
+            if on_error:
+                on_error()
+        self.process.join()
+        with self._workers_lock:
+            self.workers.discard(self.process)
+
+    @classmethod
+    def _terminate(cls, process):
+        process.terminate()
+        process.join(cls.terminate_timeout)
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+    def abort(self):
+        self._terminate(self.process)
+
+    @classmethod
+    def terminate_all(cls):
+        '''terminate all running workers (on exit of the web process)'''
+        with cls._workers_lock:
+            workers = list(cls.workers)
+            cls.workers.clear()
+        for process in workers:
+            cls._terminate(process)
+
+    def is_running(self):
+        return self.listener.is_alive() if self.listener else False
+
+
+# the workers are no daemons, multiprocessing joins them on exit. finalizers
+# with an exit priority run before that join
+multiprocessing.util.Finalize(None, ProcessExecutor.terminate_all,
+                              exitpriority=10)
+
+
+EXECUTORS = {
+    'thread': ThreadExecutor,
+    'process': ProcessExecutor,
+}
+
+
+def get_executor_class():
+    '''
+    executor class set in the settings (ORCA_EXECUTOR), either the name of a
+    known executor or the dotted path to a custom executor class
+    '''
+    from django.conf import settings
+    name = getattr(settings, 'ORCA_EXECUTOR', 'thread')
+    if name in EXECUTORS:
+        return EXECUTORS[name]
+    return import_string(name)
+
+
 class ModuleSingleton(object):
     _instance_dict = {}
 
@@ -84,24 +387,257 @@ class ModuleSingleton(object):
         key = args[0]
         if not key in cls._instance_dict:
             with lock:
-                cls._instance_dict[key] = super().__new__(cls)
+                if not key in cls._instance_dict:
+                    cls._instance_dict[key] = super().__new__(cls)
         return cls._instance_dict[key]
 
 
+def _freeze(meta: dict) -> MappingProxyType:
+    return MappingProxyType({
+        k: tuple(v) if isinstance(v, list) and k != 'default' else v
+        for k, v in meta.items()})
+
+
+class ModuleIndex:
+    '''
+    meta data of the steps and injectables of a module, built once when the
+    module is loaded. the entries are read-only
+    '''
+
+    def __init__(self, steps: dict, injectables: dict, dynamic: set = (),
+                 dependencies: dict = None):
+        self.steps = MappingProxyType(
+            {name: _freeze(meta) for name, meta in steps.items()})
+        self.injectables = MappingProxyType(
+            {name: _freeze(meta) for name, meta in injectables.items()})
+        # injectables with meta data that has to be computed on request
+        self.dynamic = frozenset(dynamic)
+        self.step_names = tuple(self.steps)
+        self.injectable_names = tuple(self.injectables)
+        self.visible_injectable_names = tuple(
+            name for name, meta in self.injectables.items()
+            if not meta.get('hidden'))
+        # dependency graph of the injectables (injectable -> parameters of
+        # its function that are injectables themselves)
+        dependencies = dependencies or {}
+        self.dependencies = MappingProxyType({
+            name: tuple(p for p in dependencies.get(name, ())
+                        if p in self.injectables)
+            for name in self.injectables})
+        children = {}
+        for name, parents in self.dependencies.items():
+            for parent in parents:
+                children.setdefault(parent, []).append(name)
+        self.children = MappingProxyType(
+            {name: tuple(c) for name, c in children.items()})
+        # injectables in topological order, parents before their children
+        try:
+            self.order = tuple(
+                TopologicalSorter(self.dependencies).static_order())
+        except CycleError:
+            logger.warning('Cyclic dependencies between the injectables')
+            self.order = self.injectable_names
+
+    def downstream(self, names) -> set:
+        '''names of all injectables depending (indirectly) on the given ones'''
+        found = set()
+        queue = list(names)
+        while queue:
+            for child in self.children.get(queue.pop(), ()):
+                if child not in found:
+                    found.add(child)
+                    queue.append(child)
+        return found
+
+
+class InstancePool:
+    '''
+    pool of fully loaded orca instances of a module, instances are handed
+    out on creation of scenario instances and refilled in the background
+    '''
+
+    def __init__(self, module_path: str, size: int = 1):
+        self.module = module_path
+        self.size = size
+        self.instances = deque()
+        self._lock = threading.Lock()
+        self._refilling = False
+        # increased on clear, instances loaded before are discarded
+        self._generation = 0
+
+    def acquire(self) -> 'OrcaWrapper':
+        '''
+        take a loaded instance out of the pool, loads one if the pool is empty
+        '''
+        with self._lock:
+            instance = self.instances.popleft() if self.instances else None
+        if instance is None:
+            instance = OrcaWrapper(self.module)
+        self.refill()
+        return instance
+
+    def refill(self):
+        '''fill the pool up to its size in a background thread'''
+        with self._lock:
+            if (self._refilling or self.size <= 0 or
+                    len(self.instances) >= self.size):
+                return
+            self._refilling = True
+        threading.Thread(target=self._fill, daemon=True).start()
+
+    def _fill(self):
+        try:
+            while True:
+                with self._lock:
+                    if len(self.instances) >= self.size:
+                        break
+                    generation = self._generation
+                instance = OrcaWrapper(self.module)
+                with self._lock:
+                    if generation == self._generation:
+                        self.instances.append(instance)
+        except Exception:
+            logger.exception(f'Failed to fill the pool of {self.module}')
+        finally:
+            with self._lock:
+                self._refilling = False
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self.instances.clear()
+
+
 class OrcaManager(ModuleSingleton):
     ''''''
     module = None
     instances = {}
     meta = {}
+    pool = None
+    index = None
+    # paths, packages, fingerprint and file states of the sources of the
+    # module
+    sources = None
+    # increased on every reload of the module
+    version = 0
     __generic_instance = None
+    _init_locks = {}
 
     def __init__(self, module_path: str):
         self.module = module_path
+        if self.index:
+            return
+        from django.conf import settings
+        # another thread (e.g. the warm-up) may be loading the module, wait
+        # for it only for a limited time when serving a request
+        timeout = -1 if getattr(_warmup_local, 'active', False) else \
+            getattr(settings, 'ORCA_MODULE_WAIT', 10)
+        init_lock = self._get_init_lock(module_path)
+        if not init_lock.acquire(timeout=timeout):
+            raise ModuleNotReady(
+                _('The module "{}" is still loading. Please try again '
+                  'later.').format(module_path))
+        try:
+            if not self.pool:
+                self.pool = InstancePool(
+                    module_path, size=getattr(settings, 'ORCA_POOL_SIZE', 1))
+                ProcessExecutor.preload_modules.add(module_path)
+            if not self.index:
+                self.index = self._read_manifest()
+            # no valid manifest, the module has to be loaded right away
+            if not self.index:
+                self.index = self._build_index()
+                self._write_manifest()
+                self.pool.refill()
+        finally:
+            init_lock.release()
+
+    @classmethod
+    def _get_init_lock(cls, module_path: str) -> threading.RLock:
+        with lock:
+            return cls._init_locks.setdefault(module_path, threading.RLock())
+
+    @property
+    def generic_instance(self) -> 'OrcaWrapper':
+        '''
+        instance of the module not bound to a scenario, loaded on first use
+        '''
         if not self.__generic_instance:
-            self.__generic_instance = self.create_instance()
+            with load_lock:
+                if not self.__generic_instance:
+                    self.__generic_instance = self.create_instance()
+        return self.__generic_instance
+
+    def _read_manifest(self) -> ModuleIndex:
+        '''index from the manifest of the module, if it is up to date'''
+        manifest = read_manifest(self.module)
+        if not manifest:
+            return
+        self.sources = {k: manifest[k]
+                        for k in ('paths', 'packages', 'fingerprint',
+                                  'files')}
+        return ModuleIndex(manifest['steps'], manifest['injectables'],
+                           dynamic=manifest['dynamic'],
+                           dependencies=manifest['dependencies'])
+
+    def _write_manifest(self):
+        module_names = getattr(self.generic_instance.orca, '_module_set',
+                               {self.module})
+        try:
+            self.sources = source_state(module_names)
+        except OSError as e:
+            logger.warning(f'Could not fingerprint the sources of '
+                           f'{self.module}: {e}')
+            self.sources = None
+        write_manifest(self.module, module_names, self.index.steps,
+                       self.index.injectables, self.index.dynamic,
+                       self.index.dependencies, sources=self.sources)
+
+    def sources_changed(self) -> bool:
+        '''
+        check if the source files of the module changed since it was loaded
+        '''
+        if not self.sources:
+            return False
+        fp, state = fingerprint(self.sources['paths'],
+                                known=self.sources['files'])
+        changed = fp != self.sources['fingerprint']
+        self.sources = dict(self.sources, fingerprint=fp, files=state)
+        return changed
+
+    def reload(self):
+        '''
+        load the changed sources of the module. the generic instance, the
+        meta data, the pool and the idle scenario instances are replaced,
+        running scenario instances are replaced after they are finished.
+        the instances of other modules are not affected
+        '''
+        logger.info(f'Reloading the module {self.module}')
+        with self._get_init_lock(self.module):
+            packages = (self.sources or {}).get('packages', [])
+            with load_lock:
+                purge_modules(packages)
+                # fails on errors in the new sources, the old instances are
+                # kept then
+                generic_instance = OrcaWrapper(self.module)
+            self.__generic_instance = generic_instance
+            self.version += 1
+            self.index = self._build_index()
+            self._write_manifest()
+            self.pool.clear()
+            with lock:
+                for iid, instance in list(self.instances.items()):
+                    if instance.module != self.module:
+                        continue
+                    if instance.is_running():
+                        instance.outdated = True
+                    else:
+                        instance.remove()
+                        del(self.instances[iid])
+            self.pool.refill()
 
     def get_calculated_value(self, injectable, *args):
-        funcwrapper = self.__generic_instance.orca.get_raw_injectable(injectable)
+        funcwrapper = self.generic_instance.orca.get_raw_injectable(injectable)
         sig = signature(funcwrapper._func)
         parameters = list(sig.parameters.keys())
         # calculate value if injectable function has parameters (meaning
@@ -111,34 +647,69 @@ class OrcaManager(ModuleSingleton):
         return funcwrapper._func(*args)
 
     def get_step_names(self):
-        return self.__generic_instance.orca.list_steps()
+        return list(self.index.step_names)
 
     def get_injectable_names(self, hidden=True):
         '''
         hidden: bool
             include injectables marked as hidden in list
         '''
-        inj_names = self.__generic_instance.orca.list_injectables()
         if not hidden:
-            vis_injs = [i for i in inj_names if not
-                        (self.get_injectable_meta(i) or {}).get('hidden')]
-            return vis_injs
-        return self.__generic_instance.orca.list_injectables()
+            return list(self.index.visible_injectable_names)
+        return list(self.index.injectable_names)
 
     def _get_orca_meta(self):
-        return getattr(self.__generic_instance.orca, 'meta', {})
+        return getattr(self.generic_instance.orca, 'meta', {})
+
+    def _build_index(self) -> ModuleIndex:
+        orca = self.generic_instance.orca
+        orca_meta = self._get_orca_meta()
+        steps = {step: self._compute_step_meta(step)
+                 for step in orca.list_steps()}
+        injectables = {}
+        dynamic = set()
+        dependencies = {}
+        for inj in orca.list_injectables():
+            funcwrapper = orca.get_raw_injectable(inj)
+            if isinstance(funcwrapper, orca._InjectableFuncWrapper):
+                dependencies[inj] = list(
+                    signature(funcwrapper._func).parameters.keys())
+            _meta = orca_meta.get(inj, {})
+            choices = _meta.get('choices')
+            if (_meta.get('refresh') == 'always' or callable(choices) and
+                (orca_meta.get(choices.__name__) or {}).get(
+                    'refresh') == 'always'):
+                dynamic.add(inj)
+            try:
+                injectables[inj] = self._compute_injectable_meta(inj)
+            # computed (and failing) on request like before
+            except Exception:
+                injectables[inj] = {'hidden': True} if _meta.get('hidden') \
+                    else {}
+                dynamic.add(inj)
+        return ModuleIndex(steps, injectables, dynamic=dynamic,
+                           dependencies=dependencies)
 
     def get_step_meta(self, step: str):
+        return self.index.steps[step]
+
+    def get_injectable_meta(self, injectable: str, instance=None):
+        if injectable in self.index.dynamic:
+            return self._compute_injectable_meta(injectable,
+                                                 instance=instance)
+        return self.index.injectables.get(injectable, {})
+
+    def _compute_step_meta(self, step: str):
         meta = self._get_orca_meta()
         step_meta = meta.get(step, {})
         required = step_meta.get('required')
         if not isinstance(required, list):
             required = [required]
         required = [r.__name__ if callable(r) else str(r) for r in required]
-        wrapper = self.__generic_instance.orca.get_step(step)
+        wrapper = self.generic_instance.orca.get_step(step)
         sig = signature(wrapper._func)
         inj_parameters = sig.parameters
-        inj_available = self.__generic_instance.orca.list_injectables()
+        inj_available = self.generic_instance.orca.list_injectables()
         injectables = [pinj for pinj in inj_parameters if pinj in inj_available]
         return {
             'name': step,
@@ -150,8 +721,8 @@ class OrcaManager(ModuleSingleton):
             'required': required,
         }
 
-    def get_injectable_meta(self, injectable: str, instance=None):
-        orca = instance or self.__generic_instance.orca
+    def _compute_injectable_meta(self, injectable: str, instance=None):
+        orca = instance or self.generic_instance.orca
         orca_injectables = orca.list_injectables()
         orca_meta = self._get_orca_meta()
         # defaults (required by serializer)
@@ -174,9 +745,9 @@ class OrcaManager(ModuleSingleton):
         datatype = datatype_class.__name__
         desc['datatype'] = datatype
         # check if the original type is overwritable
-        funcwrapper = self.__generic_instance.orca.get_raw_injectable(injectable)
+        funcwrapper = self.generic_instance.orca.get_raw_injectable(injectable)
         sig = signature(funcwrapper._func)
-        if isinstance(funcwrapper, self.__generic_instance.orca._InjectableFuncWrapper):
+        if isinstance(funcwrapper, self.generic_instance.orca._InjectableFuncWrapper):
             desc['docstring'] = _meta.get('description') or funcwrapper._func.__doc__ or ''
             # datatype from annotations
             returntype = sig.return_annotation
@@ -205,24 +776,32 @@ class OrcaManager(ModuleSingleton):
 
         desc['data_class'] = (f'{datatype_class.__module__}.'
                               f'{datatype_class.__name__}')
-        desc['default'] = self.__generic_instance.orca.get_injectable(injectable)
+        desc['default'] = self.generic_instance.orca.get_injectable(injectable)
         return desc
 
     def get_instance(self, instance_id: int, create: bool = True):
         with lock:
             instance = self.instances.get(instance_id)
+            # module changed while the instance was running
+            if instance and instance.outdated and not instance.is_running():
+                instance.remove()
+                del(self.instances[instance_id])
+                instance = None
             if not instance and create:
                 return self.create_instance(instance_id)
             return instance
 
     def create_instance(self, instance_id: int = None):
-        instance = OrcaWrapper(self.module)
         if (instance_id):
+            instance = self.pool.acquire()
             self.instances[instance_id] = instance
+        else:
+            instance = OrcaWrapper(self.module)
         return instance
 
     def reset(self):
         with lock:
+            self.pool.clear()
             if 'orca' in sys.modules:
                 del(sys.modules['orca'])
             for iid in list(self.instances.keys()):
@@ -230,73 +809,245 @@ class OrcaManager(ModuleSingleton):
                 del(self.instances[iid])
 
     def is_running(self, instance_id: int = None):
-        orca_wrapper = self.instances.get(instance_id)
+        return OrcaManager.is_instance_running(instance_id)
+
+    @classmethod
+    def is_instance_running(cls, instance_id: int) -> bool:
+        '''
+        check if the instance with the id (of any module) is running, without
+        loading any module
+        '''
+        orca_wrapper = cls.instances.get(instance_id)
         return orca_wrapper.is_running() if orca_wrapper else False
 
 
+class ModuleWarmup:
+    '''
+    loads the known modules in background threads after the start of the
+    server and keeps track of their state. requests for a module that is
+    not ready yet wait for it (see ORCA_MODULE_WAIT). the threads are daemons,
+    modules still queued or loading don't delay the exit of the process
+    '''
+    PENDING = 'pending'
+    LOADING = 'loading'
+    # the meta data is available, the generic instance is still loading
+    INDEXED = 'indexed'
+    LOADED = 'loaded'
+    FAILED = 'failed'
+
+    status = {}
+    errors = {}
+    _queue = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def start(cls):
+        '''queue all known modules, called on start of the server'''
+        from .models import Module
+        try:
+            for module in Module.objects.all():
+                cls.register(module.path)
+        # e.g. database not migrated yet
+        except Exception as e:
+            logger.warning(f'Warm-up of the modules skipped: {e}')
+
+    @classmethod
+    def register(cls, module_path: str):
+        '''queue the module for the warm-up, if not done already'''
+        from django.conf import settings
+        with cls._lock:
+            if module_path in cls.status:
+                return
+            if not cls._queue:
+                cls._queue = Queue()
+                n_workers = getattr(settings, 'ORCA_WARMUP_WORKERS', 2)
+                for i in range(n_workers):
+                    threading.Thread(target=cls._work,
+                                     name=f'orca-warmup-{i}',
+                                     daemon=True).start()
+            cls.status[module_path] = cls.PENDING
+        cls._queue.put(module_path)
+
+    @classmethod
+    def _work(cls):
+        while True:
+            cls._warm(cls._queue.get())
+
+    @classmethod
+    def _warm(cls, module_path: str):
+        _warmup_local.active = True
+        cls.status[module_path] = cls.LOADING
+        try:
+            manager = OrcaManager(module_path)
+            cls.status[module_path] = cls.INDEXED
+            manager.generic_instance
+            manager.pool.refill()
+            cls.status[module_path] = cls.LOADED
+        except Exception as e:
+            logger.exception(f'Failed to load the module {module_path}')
+            cls.status[module_path] = cls.FAILED
+            cls.errors[module_path] = str(e)
+
+    @classmethod
+    def state(cls, module_path: str) -> dict:
+        '''state of the module, modules loaded on request count as well'''
+        status = cls.status.get(module_path)
+        manager = OrcaManager._instance_dict.get(module_path)
+        if status in (None, cls.FAILED) and manager and manager.index:
+            status = cls.LOADED
+        state = {'status': status or cls.PENDING,
+                 'ready': status in (cls.INDEXED, cls.LOADED)}
+        if module_path in cls.errors and status == cls.FAILED:
+            state['error'] = cls.errors[module_path]
+        return state
+
+
+class ModuleWatcher:
+    '''
+    checks the sources of the loaded modules in regular intervals and reloads
+    the modules that changed (see OrcaManager.reload)
+    '''
+    _thread = None
+
+    @classmethod
+    def start(cls, interval: float):
+        if cls._thread or interval <= 0:
+            return
+        cls._thread = threading.Thread(target=cls._watch, args=(interval, ),
+                                       name='orca-module-watcher',
+                                       daemon=True)
+        cls._thread.start()
+
+    @classmethod
+    def _watch(cls, interval: float):
+        while True:
+            time.sleep(interval)
+            cls.check()
+
+    @staticmethod
+    def check():
+        for manager in list(OrcaManager._instance_dict.values()):
+            if not manager.index:
+                continue
+            try:
+                if manager.sources_changed():
+                    manager.reload()
+            except Exception:
+                logger.exception(f'Failed to reload the module '
+                                 f'{manager.module}')
+
+
+def start_server_tasks():
+    '''
+    start the background tasks of the serving process: the warm-up of the
+    known modules and watching their sources. called by the asgi and wsgi
+    applications only, not by management commands or tests
+    '''
+    from django.conf import settings
+    # worker processes only run steps, no need for the generic instances
+    if IN_WORKER:
+        return
+    ModuleWatcher.start(getattr(settings, 'ORCA_MODULE_WATCH_INTERVAL', 0))
+    # the modules are loaded on first request otherwise
+    if getattr(settings, 'ORCA_WARMUP', True):
+        ModuleWarmup.start()
+
+
 class OrcaWrapper():
 
     def __init__(self, module: str):
-        self.thread = None
+        self.executor = None
+        self.log_pipeline = None
         self.module = module
+        # values set from outside, passed to the worker in process mode
+        self.values = {}
+        # versions of the values of the injectables of the scenario that were
+        # applied to the instance last (see views.apply_injectables)
+        self.applied = {}
+        # the sources of the module changed since the instance was created
+        self.outdated = False
         self.orca = self.__create_instance()
 
     def __create_instance(self) -> 'module':
-        spec = importlib.util.find_spec('orca.orca')
-        orca = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(orca)
-        # append a logger
-        orca.logger = logging.getLogger(str(id(orca)))
-
-        debug = os.environ.get('LOG_LEVEL', 'DEBUG')
-        orca.logger.setLevel(logging.DEBUG if debug.upper() == 'DEBUG' else logging.INFO)
-        sys.modules['orca'] = orca
-        from orcadjango import decorators
-        importlib.reload(decorators)
-        load_module(self.module, orca=orca)
-        del(spec)
-        if 'orca' in sys.modules:
-            del(sys.modules['orca'])
+        with load_lock:
+            spec = importlib.util.find_spec('orca.orca')
+            orca = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(orca)
+            # append a logger
+            orca.logger = logging.getLogger(str(id(orca)))
+
+            debug = os.environ.get('LOG_LEVEL', 'DEBUG')
+            orca.logger.setLevel(logging.DEBUG if debug.upper() == 'DEBUG'
+                                 else logging.INFO)
+            sys.modules['orca'] = orca
+            from orcadjango import decorators
+            importlib.reload(decorators)
+            load_module(self.module, orca=orca)
+            del(spec)
+            if 'orca' in sys.modules:
+                del(sys.modules['orca'])
         return orca
 
     def add_log_handler(self, handler: logging.StreamHandler):
-        self.orca.logger.addHandler(handler)
+        '''
+        add a handler to the logger of the instance, the records are passed
+        to the handlers by the listener thread of the log pipeline
+        '''
+        if not self.log_pipeline:
+            from orcadjango.loggers import LogPipeline
+            self.log_pipeline = LogPipeline()
+        if self.log_pipeline.queue_handler not in self.orca.logger.handlers:
+            self.orca.logger.addHandler(self.log_pipeline.queue_handler)
+        self.log_pipeline.add_handler(handler)
 
     def clear_log_handlers(self):
+        # closing writes out anything the handlers still buffer
+        if self.log_pipeline:
+            self.log_pipeline.clear_handlers()
+        for handler in self.orca.logger.handlers:
+            handler.close()
         self.orca.logger.handlers.clear()
 
+    def log_metrics(self) -> dict:
+        '''state of the queue of the log pipeline'''
+        if not self.log_pipeline:
+            return {'queue_depth': 0, 'dropped': 0}
+        return self.log_pipeline.metrics
+
     def set_value(self, injectable: str, value):
+        self.values[injectable] = value
         self.orca.add_injectable(injectable, value)
 
     def start(self, steps, on_success=None, on_error=None):
         if self.is_running():
             raise InUseError(_('Thread is already running'))
-        self.thread = AbortableThread(
-            target=self.__run, args=(steps, ))
-        self.thread.on_success = on_success
-        self.thread.on_error = on_error
+        self.executor = get_executor_class()(self)
+        # the steps may change the values, apply all again afterwards
+        self.applied.clear()
         message = _('Starting run...')
         self.orca.logger.info(message)
-        self.thread.start()
+        self.executor.start(steps, on_success=on_success, on_error=on_error)
 
     def abort(self):
         if self.is_running():
             self.orca.logger.error(_('aborting...'))
-            self.thread.abort()
+            self.executor.abort()
 
     def is_running(self):
-        return self.thread.is_alive() if self.thread else False
+        return self.executor.is_running() if self.executor else False
 
     def remove(self):
         if self.is_running():
             raise Exception(
                 _('The orca instances can not be reset at the moment.'
                 ' A thread is still running.'))
-        if self.thread:
-            del(self.thread)
+        self.executor = None
         self.clear_log_handlers()
+        if self.log_pipeline:
+            self.log_pipeline.stop()
 
-    def __run(self, steps, iter_vars=None, data_out=None,
+    def run_steps(self, steps, on_success=None, on_error=None,
+                  iter_vars=None, data_out=None,
               out_interval=1, out_base_tables=None, out_run_tables=None,
               compress=False, out_base_local=True, out_run_local=True):
         """
@@ -306,6 +1057,10 @@ class OrcaWrapper():
         Parameters
         ----------
         steps : list of Step
+        on_success : function, optional
+            called after all steps finished successfully
+        on_error : function, optional
+            called after a step failed or the run was aborted
         iter_vars : iterable, optional
             The values of `iter_vars` will be made available as an injectable
             called ``iter_var`` when repeatedly running `steps`.
@@ -407,8 +1162,8 @@ class OrcaWrapper():
                                         'finished': True,
                                         'success': False
                                     }})
-                        if self.thread.on_error:
-                            self.thread.on_error()
+                        if on_error:
+                            on_error()
                         return
                     step.finished = timezone.now()
                     step.active = False
@@ -432,12 +1187,12 @@ class OrcaWrapper():
                 self.orca.clear_cache(scope=_CS_ITER)
             logger.info(_('orca run finished successfully'), extra={
                 'status': {'finished': True, 'success': True}})
-            if self.thread.on_success:
-                self.thread.on_success()
+            if on_success:
+                on_success()
         except Abort:
             logger.error(_('orca run aborted'), extra={
                 'status': {'finished': True, 'success': False}})
-            if self.thread.on_error:
-                self.thread.on_error()
+            if on_error:
+                on_error()
         finally:
             self.orca.clear_cache()
\ No newline at end of file
@@ -7,6 +7,7 @@ from django.core.validators import RegexValidator
 from rest_framework.serializers import ValidationError
 from django.core.exceptions import ValidationError as CoreValidationError
 from django.utils import timezone
+from django.db import models, transaction, connection
 
 from orcaserver.orca import OrcaManager
 from .models import (Project, Profile, Scenario, Injectable, Step, Run,
@@ -101,11 +102,17 @@ class ProjectInjectablesSerializerField(serializers.Field):
         super().__init__(**kwargs)
 
     def to_representation(self, obj):
-        orca_manager = OrcaManager(obj.module)
-        module = obj._module
+        # the modules are fetched once per request by the view
+        modules = self.context.get('modules')
+        module = modules.get(obj.module) if modules is not None \
+            else obj._module
         if not module:
             return []
-        init_names = obj._module.init_injectables
+        # meta data from the index of the module without evaluating it,
+        # only the dynamic injectables (refreshed always or not indexable)
+        # are computed
+        orca_manager = OrcaManager(obj.module)
+        init_names = module.init_injectables
         init_values = json.loads(obj.init)
         injectables = []
         for inj_name in init_names:
@@ -132,12 +139,26 @@ class ProjectInjectablesSerializerField(serializers.Field):
             init[inj['name']] = inj['serialized_value']
         return {'init': json.dumps(init)}
 
-def validate_unique_inj(inj_name: str, value, project_id: int = None):
+def validate_unique_inj(inj_name: str, value, project_id: int = None,
+                        value_hash: str = None):
     '''validate if given value of injectable is not existing in other projects
     than the passed one
-    raises ValidationError if it does and therefore is not unique'''
+    raises ValidationError if it does and therefore is not unique.
+    values stored in binary format or as geometries are compared by the hash
+    of the stored value (see Injectable.update_hash) which has to be passed
+    then.
+    inside a transaction concurrent checks of the same value wait until the
+    transaction is finished, the check and the write should be done in the
+    same transaction'''
+    if value_hash is None:
+        value_hash = Injectable.hash_value(value)
+    if transaction.get_connection().in_atomic_block:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock('
+                           'hashtextextended(%s, 0))',
+                           [f'unique-injectable:{inj_name}:{value_hash}'])
     same_val_inj = Injectable.objects.filter(
-        name=inj_name, value=value)
+        name=inj_name, value_hash=value_hash)
     if project_id is not None:
         same_val_inj = same_val_inj.exclude(scenario__project=project_id)
     if same_val_inj.count():
@@ -146,16 +167,16 @@ def validate_unique_inj(inj_name: str, value, project_id: int = None):
         project_names = ', '.join(
             f'"{pn}"' for pn in same_val_inj.values_list(
                 'scenario__project__name', flat=True).distinct())
-        raise ValidationError({inj_name: f'Value has to be unique. "{value}" '
-                              'is already used in project '
+        used = f'"{value}" is' if value is not None else 'The value is'
+        raise ValidationError({inj_name: f'Value has to be unique. {used} '
+                              'already used in project '
                               f'{project_names}.'})
 
 
 class ProjectSerializer(serializers.ModelSerializer):
     created = serializers.DateTimeField(format="%Y-%m-%d", required=False)
     injectables = ProjectInjectablesSerializerField(required=False)
-    scenario_count = serializers.IntegerField(source='scenario_set.count',
-                                              read_only=True)
+    scenario_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Project
@@ -163,6 +184,13 @@ class ProjectSerializer(serializers.ModelSerializer):
                    'archived', 'created', 'injectables', 'scenario_count')
         optional_fields = ('module', 'code', 'user', 'archived', 'created')
 
+    def get_scenario_count(self, obj):
+        # annotated by the view
+        if hasattr(obj, 'n_scenarios'):
+            return obj.n_scenarios
+        return obj.scenario_set.count()
+
+    @transaction.atomic
     def create(self, validated_data):
         module_path = validated_data.get('module')
         if not module_path:
@@ -174,6 +202,7 @@ class ProjectSerializer(serializers.ModelSerializer):
             instance.save()
         return instance
 
+    @transaction.atomic
     def update(self, obj, validated_data):
         self.__validate_inj(obj.module, validated_data, project=obj)
         return super().update(obj, validated_data)
@@ -192,8 +221,12 @@ class ProjectSerializer(serializers.ModelSerializer):
         for inj_name, value in inj_data.items():
             meta = orca_manager.get_injectable_meta(inj_name)
             if meta.get('unique'):
+                # compared the way the value will be stored in the scenarios
+                value_hash = Injectable.hash_text(meta.get('data_class'),
+                                                  value)
                 validate_unique_inj(inj_name, value,
-                                    project_id=project.id if project else None)
+                                    project_id=project.id if project else None,
+                                    value_hash=value_hash)
             if meta.get('regex'):
                 regex = meta.get('regex')
                 regex_validator = RegexValidator(
@@ -219,21 +252,30 @@ class ScenarioSerializer(serializers.ModelSerializer):
         return instance
 
     def get_last_run(self, obj):
-        # actually atm there will only be one, just in case
-        runs = Run.objects.filter(scenario=obj).order_by('finished')
+        # annotated by the view
+        if hasattr(obj, 'last_run_id'):
+            if obj.last_run_id is None:
+                return
+            run = Run(id=obj.last_run_id, started=obj.last_run_started,
+                      finished=obj.last_run_finished,
+                      success=obj.last_run_success,
+                      run_by_id=obj.last_run_by)
+            return RunSerializer(run).data
+        runs = Run.objects.filter(scenario=obj).order_by('started')
         if not runs:
             return
         return RunSerializer(runs.last()).data
 
     def get_is_running(self, obj):
-        return OrcaManager(obj.project.module).is_running(obj.orca_id)
+        return OrcaManager.is_instance_running(obj.orca_id)
 
 
 class ScenarioLogSerializer(serializers.ModelSerializer):
     timestamp = serializers.DateTimeField(format="%d.%m.%Y %H:%M:%S")
     class Meta:
         model = LogEntry
-        fields = ('scenario', 'message', 'timestamp', 'level', 'status')
+        fields = ('id', 'seq', 'scenario', 'run', 'message', 'timestamp',
+                  'level', 'status')
 
 
 class RunSerializer(serializers.ModelSerializer):
@@ -246,6 +288,27 @@ class RunSerializer(serializers.ModelSerializer):
         fields =  ('started', 'finished', 'success', 'run_by')
 
 
+class InjectableValueField(serializers.JSONField):
+    '''
+    value of an injectable. values stored in binary format are only converted
+    to JSON if requested with the query parameter "binary=json", a summary is
+    returned otherwise
+    '''
+
+    def get_attribute(self, instance):
+        if getattr(instance, 'blob_format', None) and not instance.parents:
+            request = self.context.get('request')
+            if not request or request.query_params.get('binary') != 'json':
+                # values in the blob store have no blob in the row
+                if instance.value_ref_id:
+                    size = instance.value_ref.size
+                else:
+                    size = len(instance.blob) if instance.blob is not None \
+                        else None
+                return {'binary': instance.blob_format, 'size': size}
+        return super().get_attribute(instance)
+
+
 class InjectableSerializer(serializers.Serializer):
     '''computed injectables of the module'''
     name = serializers.CharField()
@@ -263,7 +326,7 @@ class InjectableSerializer(serializers.Serializer):
     title = serializers.CharField(source='meta.title', required=False,
                                   allow_blank=True)
     regex_help = serializers.SerializerMethodField()
-    value = serializers.JSONField(source='serialized_value')
+    value = InjectableValueField(source='serialized_value')
 
     def get_choices(self, obj):
         return obj.meta.get('choices')
@@ -294,19 +357,39 @@ class InjectableSerializer(serializers.Serializer):
     def get_editable_keys(self, obj):
         return obj.meta.get('editable_keys', False)
 
+    @transaction.atomic
     def update(self, obj, validated_data):
-        value = validated_data.get('value')
-        if obj.meta.get('unique') and value is not None:
-            validate_unique_inj(obj.name, value, project_id=obj.scenario.project.id)
+        if obj.meta.get('unique') and 'value' in validated_data:
+            # values in binary format and geometries are set on the instance
+            # only, they are compared by the hash of the stored value
+            obj.value = validated_data['value']
+            obj.update_hash()
+            if obj.value_hash is not None:
+                validate_unique_inj(obj.name, obj.value,
+                                    project_id=obj.scenario.project.id,
+                                    value_hash=obj.value_hash)
         return super().update(obj, validated_data)
 
 
+class ScenarioInjectableListSerializer(serializers.ListSerializer):
+    '''calculates the derived values of all injectables at once'''
+
+    def to_representation(self, data):
+        injectables = data.all() if isinstance(data, models.Manager) \
+            else data
+        injectables = list(injectables)
+        Injectable.evaluate_derived(injectables)
+        Injectable.prefetch_blobs(injectables)
+        return super().to_representation(injectables)
+
+
 class ScenarioInjectableSerializer(InjectableSerializer,
                                    serializers.ModelSerializer):
     '''injectables with values from database for a specific scenario'''
 
     class Meta:
         model = Injectable
+        list_serializer_class = ScenarioInjectableListSerializer
         fields = ('id', 'name', 'title', 'group', 'order', 'scenario', 'value', 'multi', 'scope',
                   'datatype', 'editable_keys', 'parents', 'description', 'editable', 'choices',
                   'unique', 'regex_help')
@@ -317,10 +400,20 @@ class ScenarioInjectableSerializer(InjectableSerializer,
         if 'serialized_value' in validated_data:
             serialized_value = validated_data.pop('serialized_value')
             conv = OrcaTypeMap.get(instance.data_class)
-            validated_data['value'] = conv.to_str(serialized_value)
+            if conv.binary_format or conv.spatial:
+                text = serialized_value if isinstance(serialized_value, str) \
+                    else json.dumps(serialized_value)
+            else:
+                text = conv.to_str(serialized_value)
+            # resets the references to formerly stored values
+            instance.set_text(text)
+            validated_data['value'] = instance.value
             # ToDo: validation here (can't be done in overwritten validate
             # function, instance not known there)
-        return super().update(instance, validated_data)
+        instance = super().update(instance, validated_data)
+        if 'value' in validated_data:
+            instance.invalidate_downstream()
+        return instance
 
 
 class ModuleSerializer(serializers.ModelSerializer):
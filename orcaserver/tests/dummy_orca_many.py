@@ -0,0 +1,6 @@
+import orca
+
+
+# a module with more injectables than dummy_orca_stuff
+for i in range(50):
+    orca.add_injectable(f'inj_{i}', f'value {i}')
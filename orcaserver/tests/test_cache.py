@@ -0,0 +1,54 @@
+from django.test import SimpleTestCase
+
+from orcaserver.cache import LRUCache
+
+
+class TestLRUCache(SimpleTestCase):
+    """Test the LRU cache of derived and decoded values"""
+
+    def test_eviction(self):
+        """the least recently used entries are evicted first"""
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        # "a" is used more recently than "b" now
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+        self.assertEqual(len(cache), 2)
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIn('c', cache)
+
+    def test_overwrite(self):
+        """setting an existing key replaces the value without growing"""
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('a', 2)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.get('a'), 2)
+
+    def test_missing(self):
+        """missing keys return the default and are counted as misses"""
+        cache = LRUCache(maxsize=2)
+        missing = object()
+        self.assertIs(cache.get('a', missing), missing)
+        # None is a valid value
+        cache.set('a', None)
+        self.assertIsNone(cache.get('a', missing))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_disabled(self):
+        """nothing is stored with a max. size of 0"""
+        cache = LRUCache(maxsize=0)
+        cache.set('a', 1)
+        self.assertEqual(len(cache), 0)
+        self.assertIsNone(cache.get('a'))
+
+    def test_pop_and_clear(self):
+        cache = LRUCache(maxsize=3)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.pop('a'), 1)
+        self.assertIsNone(cache.pop('a'))
+        cache.clear()
+        self.assertEqual(len(cache), 0)
@@ -0,0 +1,121 @@
+import logging
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from orcadjango.loggers import LogRateLimiter
+from orcadjango.urls import websocket_urlpatterns
+from orcaserver.models import Project, Scenario, LogEntry
+
+
+class TestLogRateLimiter(SimpleTestCase):
+    """Test limiting the log records of a scenario"""
+
+    def record(self, message, level=logging.INFO, created=100.0,
+               status=None):
+        record = logging.LogRecord('OrcaLog', level, __file__, 1, message,
+                                   None, None)
+        record.created = created
+        if status:
+            record.status = status
+        return record
+
+    def messages(self, records):
+        return [r.getMessage() for r in records]
+
+    def test_repetitions(self):
+        """repetitions of a message are coalesced into one record"""
+        limiter = LogRateLimiter(rates={})
+        self.assertEqual(self.messages(limiter.process(self.record('a'))),
+                         ['a'])
+        for i in range(3):
+            self.assertEqual(limiter.process(self.record('a')), [])
+        self.assertEqual(self.messages(limiter.process(self.record('b'))),
+                         ['last message repeated 3 times', 'b'])
+
+    def test_rate(self):
+        """records exceeding the rate of their level are suppressed"""
+        limiter = LogRateLimiter(rates={'DEBUG': 2})
+        passed = []
+        for i in range(5):
+            passed += limiter.process(
+                self.record(f'debug {i}', level=logging.DEBUG))
+        self.assertEqual(self.messages(passed), ['debug 0', 'debug 1'])
+        # other levels are not limited
+        self.assertEqual(self.messages(limiter.process(self.record('info'))),
+                         ['info'])
+        # the suppressed records are reported in the next second
+        records = limiter.process(
+            self.record('debug 5', level=logging.DEBUG, created=101.0))
+        self.assertEqual(self.messages(records),
+                         ['3 log messages suppressed', 'debug 5'])
+        self.assertEqual(records[0].levelno, logging.WARNING)
+
+    def test_always_passed(self):
+        """errors and records with status are neither limited nor coalesced"""
+        limiter = LogRateLimiter(rates={'INFO': 1, 'ERROR': 1})
+        limiter.process(self.record('info'))
+        for i in range(3):
+            self.assertEqual(len(limiter.process(
+                self.record('error', level=logging.ERROR))), 1)
+            self.assertEqual(len(limiter.process(
+                self.record('step', status={'step': 'a'}))), 1)
+
+    def test_ignored(self):
+        """ignored messages are filtered out"""
+        limiter = LogRateLimiter(rates={})
+        self.assertEqual(limiter.process(
+            self.record('registering injectable "a"')), [])
+
+
+@override_settings(CHANNEL_LAYERS={
+    'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class TestScenarioLogReplay(TransactionTestCase):
+    """Test replaying the stored log entries on connect"""
+
+    def setUp(self):
+        project = Project.objects.create(
+            name='project', module='orcaserver.tests.dummy_orca_stuff')
+        self.scenario = Scenario.objects.create(name='scenario',
+                                                project=project)
+        LogEntry.objects.bulk_create([
+            LogEntry(scenario=self.scenario, seq=seq, message=f'entry {seq}',
+                     timestamp=timezone.now())
+            for seq in range(1, 6)])
+
+    async def connect(self, query: str = ''):
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns),
+            f'/ws/scenariolog/{self.scenario.id}/{query}')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    def test_replay(self):
+        """entries after "since" are replayed, then the live ones follow"""
+        async def replay():
+            communicator = await self.connect('?since=2')
+            frame = await communicator.receive_json_from()
+            self.assertEqual([r['seq'] for r in frame['records']], [3, 4, 5])
+            # already replayed entries are not sent again
+            room = f'scenario_{self.scenario.id}'
+            for seq in (5, 6):
+                await get_channel_layer().group_send(room, {
+                    'type': 'log_message', 'message': f'entry {seq}',
+                    'level': 'INFO', 'seq': seq})
+            frame = await communicator.receive_json_from()
+            self.assertEqual([r['seq'] for r in frame['records']], [6])
+            self.assertEqual(frame['id'], 1)
+            await communicator.disconnect()
+        async_to_sync(replay)()
+
+    def test_malformed_since(self):
+        """malformed values of "since" are ignored"""
+        async def connect():
+            communicator = await self.connect('?since=x')
+            self.assertTrue(await communicator.receive_nothing())
+            await communicator.disconnect()
+        async_to_sync(connect)()
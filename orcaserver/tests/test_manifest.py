@@ -0,0 +1,73 @@
+import os
+import sys
+import tempfile
+import importlib
+from django.test import SimpleTestCase
+
+from orcaserver.manifest import (write_manifest, read_manifest,
+                                 _dump_injectable)
+
+
+class TestManifest(SimpleTestCase):
+    """Test storing the meta data of a module in its manifest"""
+    module = 'orca_manifest_test_module'
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.fn = os.path.join(os.path.abspath(self.tmp.name),
+                               f'{self.module}.py')
+        self.write_source('VALUE = 1\n')
+        sys.path.insert(0, self.tmp.name)
+        importlib.invalidate_caches()
+
+    def tearDown(self):
+        sys.path.remove(self.tmp.name)
+        self.tmp.cleanup()
+
+    def write_source(self, source: str):
+        with open(self.fn, 'w') as f:
+            f.write(source)
+
+    def write_manifest(self):
+        write_manifest(
+            self.module, [self.module],
+            steps={'step': {'name': 'step', 'order': 1}},
+            injectables={
+                'text': {'data_class': 'builtins.str', 'default': 'a'},
+                'pair': {'data_class': 'builtins.tuple', 'default': (1, 2)},
+            },
+            dynamic={'text'}, dependencies={'pair': ['text']})
+
+    def test_round_trip(self):
+        """the meta data is read as it was written"""
+        self.write_manifest()
+        manifest = read_manifest(self.module)
+        self.assertIsNotNone(manifest)
+        self.assertEqual(manifest['steps'],
+                         {'step': {'name': 'step', 'order': 1}})
+        self.assertEqual(manifest['injectables']['text']['default'], 'a')
+        # stored as text, converted back on read
+        self.assertEqual(manifest['injectables']['pair']['default'], (1, 2))
+        self.assertEqual(manifest['dynamic'], {'text'})
+        self.assertEqual(manifest['dependencies'], {'pair': ['text']})
+        # a top-level single-file module is tracked by its file only
+        self.assertEqual(manifest['paths'], [self.fn])
+        self.assertEqual(manifest['packages'], [self.module])
+
+    def test_changed_sources(self):
+        """the manifest is invalid after the sources changed"""
+        self.write_manifest()
+        self.write_source('VALUE = 2 * 1\n')
+        self.assertIsNone(read_manifest(self.module))
+
+    def test_defaults(self):
+        """defaults changing in json are stored as text"""
+        for default in [(1, 2), {1: 'a'}, {'a': [(1, )]}]:
+            dumped = _dump_injectable({'data_class': 'builtins.tuple',
+                                       'default': default})
+            self.assertNotIn('default', dumped)
+            self.assertEqual(dumped['default_str'], str(default))
+        for default in [None, 1, 'a', [1, 'b'], {'a': [1.5, None]}]:
+            dumped = _dump_injectable({'data_class': 'builtins.dict',
+                                       'default': default})
+            self.assertEqual(dumped['default'], default)
@@ -1,9 +1,161 @@
-from django.test import TestCase
+from datetime import timedelta
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.test import APITestCase
 from . import dummy_orca_stuff
 import orca
 
+from orcaserver.models import Project, Scenario, Run, Injectable, LogEntry
+from orcaserver.serializers import ScenarioInjectableSerializer
+
 class TestInjectables(TestCase):
     """Test the Injectables view"""
     def test_1(self):
         """"""
         orca.run(['step1', 'step2', 'step_dict'])
+
+
+class TestScenarioList(APITestCase):
+    """Test the number of queries of the scenario list"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='tester')
+        self.client.force_authenticate(user=self.user)
+        self.project = Project.objects.create(
+            name='project', module='orcaserver.tests.dummy_orca_stuff')
+
+    def add_scenarios(self, n):
+        for i in range(n):
+            scenario = Scenario.objects.create(name=f'scenario {i}',
+                                               project=self.project)
+            # the last run is the successful one
+            for j in range(3):
+                started = timezone.now() + timedelta(minutes=j)
+                Run.objects.create(scenario=scenario, run_by=self.user,
+                                   started=started, finished=started,
+                                   success=j == 2)
+
+    def test_query_count(self):
+        """the number of queries does not depend on the number of scenarios"""
+        for n in (2, 20):
+            self.add_scenarios(n)
+            with self.assertNumQueries(1):
+                response = self.client.get(
+                    '/api/scenarios/', {'project': self.project.id})
+            self.assertEqual(response.status_code, 200)
+            for scenario in response.data:
+                self.assertTrue(scenario['last_run']['success'])
+                self.assertFalse(scenario['is_running'])
+
+
+@override_settings(ORCA_BLOB_THRESHOLD=16)
+class TestBlobStore(TestCase):
+    """Test updating values moved to the blob store"""
+
+    def setUp(self):
+        project = Project.objects.create(
+            name='project', module='orcaserver.tests.dummy_orca_stuff')
+        self.scenario = Scenario.objects.create(name='scenario',
+                                                project=project)
+
+    def test_update_externalized(self):
+        """updated values replace the values in the blob store"""
+        for data_class, first, second in [
+                ('builtins.str', 'a' * 100, 'b' * 100),
+                ('builtins.dict', {'a': 'x' * 100}, {'b': 'y' * 100})]:
+            inj = Injectable(name=f'blob_{data_class}',
+                             scenario=self.scenario, data_class=data_class,
+                             datatype=data_class.split('.')[1],
+                             meta={'unique': False})
+            inj.set_value(first)
+            inj.save()
+            self.assertIsNotNone(inj.value_ref_id)
+            serializer = ScenarioInjectableSerializer(
+                inj, data={'value': second}, partial=True)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+            stored = Injectable.objects.get(pk=inj.pk)
+            self.assertIsNotNone(stored.value_ref_id)
+            self.assertEqual(stored.deserialized_value, second)
+            self.assertEqual(stored.serialized_value, second)
+
+
+class TestRecreateInjectables(TestCase):
+    """Test the number of queries when recreating the injectables"""
+
+    modules = ('orcaserver.tests.dummy_orca_stuff',
+               'orcaserver.tests.dummy_orca_many')
+
+    def create_scenario(self, module):
+        project = Project.objects.create(name=module, module=module)
+        scenario = Scenario.objects.create(name='scenario', project=project)
+        scenario.recreate_injectables()
+        return scenario
+
+    def test_query_count(self):
+        """
+        the number of queries does not depend on the number of injectables,
+        unchanged injectables are not written
+        """
+        small, large = (self.create_scenario(module)
+                        for module in self.modules)
+        self.assertLess(small.injectable_set.count(),
+                        large.injectable_set.count())
+        with CaptureQueriesContext(connection) as queries:
+            small.recreate_injectables(keep_values=True)
+        self.assertFalse(any(query['sql'].startswith('UPDATE')
+                             for query in queries.captured_queries))
+        with self.assertNumQueries(len(queries)):
+            large.recreate_injectables(keep_values=True)
+
+
+class TestScenarioLog(APITestCase):
+    """Test the keyset pagination of the scenario log"""
+
+    def setUp(self):
+        user = User.objects.create(username='tester')
+        self.client.force_authenticate(user=user)
+        project = Project.objects.create(
+            name='project', module='orcaserver.tests.dummy_orca_stuff')
+        scenario = Scenario.objects.create(name='scenario', project=project)
+        LogEntry.objects.bulk_create([
+            LogEntry(scenario=scenario, seq=i + 1, message=f'entry {i}',
+                     level='DEBUG' if i % 2 else 'INFO',
+                     timestamp=timezone.now())
+            for i in range(10)])
+        self.ids = list(LogEntry.objects.filter(scenario=scenario).order_by(
+            'id').values_list('id', flat=True))
+        self.url = f'/api/scenarios/{scenario.id}/logs/'
+
+    def get_ids(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [entry['id'] for entry in response.data]
+
+    def test_pages(self):
+        """pages after and before an entry"""
+        self.assertEqual(self.get_ids(page_size=3), self.ids[:3])
+        self.assertEqual(self.get_ids(after_id=self.ids[2], page_size=3),
+                         self.ids[3:6])
+        self.assertEqual(self.get_ids(before_id=self.ids[6], page_size=3),
+                         self.ids[3:6])
+        self.assertEqual(self.get_ids(n_last=2), self.ids[-2:])
+        self.assertEqual(self.get_ids(level='INFO', page_size=2),
+                         self.ids[0:4:2])
+
+    @override_settings(ORCA_LOG_MAX_PAGE_SIZE=4)
+    def test_limit(self):
+        """the number of entries per request is limited"""
+        self.assertEqual(self.get_ids(page_size=100), self.ids[:4])
+        self.assertEqual(self.get_ids(), self.ids[:4])
+        self.assertEqual(self.get_ids(n_last=100), self.ids[-4:])
+
+    def test_invalid(self):
+        """malformed parameters are rejected"""
+        for params in [{'after_id': 'x'}, {'before_id': '1.5'},
+                       {'page_size': -1}, {'n_last': ''}]:
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400)
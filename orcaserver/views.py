@@ -2,9 +2,13 @@ from rest_framework import viewsets
 from rest_framework.decorators import action
 from django.contrib.auth.models import User
 from django.utils import timezone
+from django.conf import settings
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.views import exception_handler as drf_exception_handler
+from rest_framework.exceptions import ValidationError
 from django.utils.translation import gettext as _
+from django.db.models import F, OuterRef, Subquery, Count
 
 from .serializers import (ProjectSerializer, UserSerializer,
                           ScenarioSerializer, ModuleSerializer,
@@ -14,21 +18,47 @@ from .serializers import (ProjectSerializer, UserSerializer,
                           AvatarSerializer)
 from .models import (Project, Scenario, Injectable, Step, Run, LogEntry,
                      SiteSetting, Module, Avatar)
-from orcaserver.orca import OrcaManager
-from orcadjango.loggers import ScenarioHandler
+from orcaserver.orca import OrcaManager, ModuleWarmup, ModuleNotReady
+from orcadjango.loggers import ScenarioHandler, publisher
 from .injectables import OrcaTypeMap
 
 
-def apply_injectables(scenario):
+def exception_handler(exc, context):
+    '''answer requests for modules still loading with 503'''
+    if isinstance(exc, ModuleNotReady):
+        return Response({'message': str(exc)},
+                        status.HTTP_503_SERVICE_UNAVAILABLE,
+                        headers={'Retry-After': '5'})
+    return drf_exception_handler(exc, context)
 
+
+def apply_injectables(scenario, force=False):
+    '''
+    set the values of the editable injectables of the scenario in its orca
+    instance. only the values changed since they were last applied to the
+    instance are fetched and deserialized, unless forced to apply all
+    '''
     orca_manager = OrcaManager(scenario.project.module)
     orca = orca_manager.get_instance(scenario.orca_id)
+    if force:
+        orca.applied.clear()
     inj_names = orca_manager.get_injectable_names()
-    injectables = Injectable.objects.filter(name__in=inj_names,
-                                            scenario=scenario)
+    # the hash is updated whenever the value is stored, the values
+    # themselves are not read
+    injectables = Injectable.objects.filter(
+        name__in=inj_names, scenario=scenario).defer('value', 'blob', 'geom')
+    changed = {}
     for inj in injectables:
-        if inj.editable:
-            orca.set_value(inj.name, inj.deserialized_value)
+        if not inj.editable:
+            continue
+        version = (inj.data_class, inj.value_hash)
+        if orca.applied.get(inj.name) != version:
+            changed[inj.pk] = version
+    if not changed:
+        return
+    for inj in Injectable.objects.filter(pk__in=changed):
+        orca.set_value(inj.name, inj.deserialized_value)
+        orca.applied[inj.name] = changed[inj.pk]
 
 
 class ProjectViewSet(viewsets.ModelViewSet):
@@ -39,8 +69,16 @@ class ProjectViewSet(viewsets.ModelViewSet):
         module = self.request.query_params.get('module')
         queryset = self.queryset.filter(module=module) if module is not None \
             else self.queryset
+        queryset = queryset.annotate(n_scenarios=Count('scenario'))
         return queryset.order_by('name')
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        # modules by path, the projects only store the path
+        context['modules'] = {module.path: module
+                              for module in Module.objects.all()}
+        return context
+
 
 class ScenarioViewSet(viewsets.ModelViewSet):
     queryset = Scenario.objects.all()
@@ -50,6 +88,16 @@ class ScenarioViewSet(viewsets.ModelViewSet):
         project = self.request.query_params.get('project')
         queryset = self.queryset.filter(project=project) if project is not None \
             else self.queryset
+        # last run of each scenario in the same query
+        runs = Run.objects.filter(scenario=OuterRef('pk')).order_by(
+            F('started').desc(nulls_first=True))
+        queryset = queryset.annotate(
+            last_run_id=Subquery(runs.values('id')[:1]),
+            last_run_started=Subquery(runs.values('started')[:1]),
+            last_run_finished=Subquery(runs.values('finished')[:1]),
+            last_run_success=Subquery(runs.values('success')[:1]),
+            last_run_by=Subquery(runs.values('run_by')[:1]),
+        )
         return queryset.order_by('name')
 
     @action(detail=True, methods=['post'])
@@ -93,19 +141,16 @@ class ScenarioViewSet(viewsets.ModelViewSet):
                 return Response({'message': msg}, status.HTTP_400_BAD_REQUEST)
 
         active_steps.update(started=None, finished=None, success=False)
-        apply_injectables(scenario)
+        # the steps might have changed values in the instance in former runs
+        apply_injectables(scenario, force=True)
+
+        run = Run.objects.create(scenario=scenario, run_by=request.user,
+                                 started=timezone.now())
 
         orca.clear_log_handlers()
-        handler = ScenarioHandler(scenario)
+        handler = ScenarioHandler(scenario, run=run)
         orca.add_log_handler(handler)
 
-        run, created = Run.objects.get_or_create(scenario=scenario)
-        run.run_by = request.user
-        run.success = False
-        run.started = timezone.now()
-        run.finished =  None
-        run.save()
-
         def on_success():
             run.success = True
             run.finished = timezone.now()
@@ -136,6 +181,17 @@ class ScenarioViewSet(viewsets.ModelViewSet):
         return Response({'message': _('Injectables synchronized')},
                         status.HTTP_200_OK)
 
+    @action(detail=True, methods=['get'])
+    def log_metrics(self, request, **kwargs):
+        scenario = Scenario.objects.get(id=kwargs.get('pk'))
+        manager = OrcaManager(scenario.project.module)
+        orca = manager.get_instance(scenario.orca_id, create=False)
+        metrics = orca.log_metrics() if orca else {'queue_depth': 0,
+                                                   'dropped': 0}
+        # messages not sent to the clients because the queue was full
+        metrics = dict(metrics, publisher_dropped=publisher.dropped)
+        return Response(metrics, status.HTTP_200_OK)
+
     @action(detail=True, methods=['post'])
     def abort(request, *args, **kwargs):
         scenario = Scenario.objects.get(id=kwargs.get('pk'))
@@ -198,14 +254,16 @@ class ScenarioInjectableViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         scenario = Scenario.objects.get(id=self.kwargs['scenario_pk'])
-        queryset = self.queryset.filter(scenario=scenario)
+        queryset = self.queryset.filter(scenario=scenario).select_related(
+            'scenario__project', 'value_ref').defer('value_ref__data')
         orca_manager = OrcaManager(scenario.project.module)
         apply_injectables(scenario)
         mod_injs = orca_manager.get_injectable_names(hidden=False)
         scen_injs = [i.name for i in queryset]
         if (set(mod_injs) != set(scen_injs)):
             scenario.recreate_injectables(keep_values=True)
-            queryset = self.queryset.filter(scenario=scenario)
+            queryset = self.queryset.filter(scenario=scenario).select_related(
+                'scenario__project', 'value_ref').defer('value_ref__data')
         return queryset
 
 
@@ -213,6 +271,24 @@ class ModuleViewSet(viewsets.ModelViewSet):
     queryset = Module.objects.all()
     serializer_class = ModuleSerializer
 
+    def perform_create(self, serializer):
+        module = serializer.save()
+        ModuleWarmup.register(module.path)
+
+    @action(detail=False, methods=['get'])
+    def ready(self, request, **kwargs):
+        '''
+        loading state of the modules, status 503 as long as not all modules
+        are ready
+        '''
+        modules = {module.name: ModuleWarmup.state(module.path)
+                   for module in Module.objects.all()}
+        ready = all(m['ready'] or m['status'] == ModuleWarmup.FAILED
+                    for m in modules.values())
+        return Response({'ready': ready, 'modules': modules},
+                        status.HTTP_200_OK if ready
+                        else status.HTTP_503_SERVICE_UNAVAILABLE)
+
 
 class StepViewSet(viewsets.ViewSet):
     serializer_class = StepSerializer
@@ -250,17 +326,60 @@ class ScenarioLogViewSet(viewsets.ModelViewSet):
     serializer_class = ScenarioLogSerializer
 
     def get_queryset(self):
+        '''
+        log of the scenario in order of creation, query parameters:
+        level - "INFO" to return INFO and ERROR entries only
+        run - return the entries of the run with this id only
+        after_id - return entries created after the entry with this id
+        before_id - return entries created before the entry with this id
+        page_size - max. number of entries, with "before_id" the entries
+                    right before it, otherwise the entries right after
+                    "after_id" resp. the start of the log
+        n_last - return the n last entries (of the selection)
+        the number of entries is limited to ORCA_LOG_MAX_PAGE_SIZE
+        '''
         queryset = self.queryset.filter(scenario=self.kwargs['scenario_pk'])
-        level = self.request.query_params.get('level')
-        n_last = self.request.query_params.get('n_last')
+        params = self.request.query_params
+        level = params.get('level')
+        max_size = getattr(settings, 'ORCA_LOG_MAX_PAGE_SIZE', 5000)
+        n_last = self._int_param('n_last', max_value=max_size)
+        after_id = self._int_param('after_id')
+        before_id = self._int_param('before_id')
+        page_size = self._int_param('page_size', max_value=max_size)
+        run = self._int_param('run')
+        if run is not None:
+            queryset = queryset.filter(run=run)
         # only possible options: DEBUG or INFO (DEBUG is everything anyway)
         if level == 'INFO':
             queryset = queryset.filter(level__in=['INFO', 'ERROR'])
+        if after_id is not None:
+            queryset = queryset.filter(id__gt=after_id)
+        if before_id is not None:
+            queryset = queryset.filter(id__lt=before_id)
+            if n_last is None and page_size is not None:
+                n_last = page_size
         if n_last is not None:
-            queryset = queryset.order_by('-timestamp')[:int(n_last)][::-1]
-        else:
-            queryset = queryset.order_by('timestamp')
-        return queryset
+            return queryset.order_by('-id')[:n_last][::-1]
+        queryset = queryset.order_by('id')
+        return queryset[:max_size if page_size is None else page_size]
+
+    def _int_param(self, name: str, max_value: int = None):
+        '''
+        non-negative integer query parameter (None if not passed), limited to
+        the max. value. raises ValidationError (400) on other values
+        '''
+        value = self.request.query_params.get(name)
+        if value is None:
+            return
+        try:
+            value = int(value)
+        except ValueError:
+            raise ValidationError({name: _('Integer expected')})
+        if value < 0:
+            raise ValidationError({name: _('Must not be negative')})
+        if max_value is not None:
+            value = min(value, max_value)
+        return value
 
 
 class SingletonViewSet(viewsets.ModelViewSet):
@@ -1,7 +1,6 @@
 import { AfterViewInit, ChangeDetectorRef, Component, ElementRef, Input, OnDestroy, ViewChild } from '@angular/core';
 import { RestService, ScenarioLogEntry } from "../../rest-api";
 import { SettingsService } from "../../settings.service";
-import { environment } from "../../../environments/environment";
 import { Subscription } from "rxjs";
 import { CookieService } from "ngx-cookie-service";
 
@@ -37,10 +36,12 @@ export class ScenarioLogComponent implements OnDestroy, AfterViewInit {
         this.scrollToBottom();
       }));
     this.subscriptions.push(this.settings.activeScenario$.subscribe( scenario => {
+      this.logs = [];
       this.entries = [];
-      if (this.fetchOldLogs)
-        this.fetchLogs();
     }));
+    // the history is fetched by the settings before connecting to the live log
+    if (this.fetchOldLogs)
+      this.subscriptions.push(this.settings.scenarioLogHistory$.subscribe(logs => this.showLogs(logs)));
   }
 
   changeLogLevel(level: string): void {
@@ -50,15 +51,11 @@ export class ScenarioLogComponent implements OnDestroy, AfterViewInit {
     this.scrollToBottom(true);
   }
 
-  fetchLogs() {
-    if (!this.settings.activeScenario$.value)
-      return;
-    this.rest.getScenarioLogs(this.settings.activeScenario$.value, { level: 'DEBUG', nLast: environment.maxLogs }).subscribe(
-      logs => {
-        this.logs = logs;
-        logs.forEach(log => this.addLogLine(log));
-        this.scrollToBottom(true);
-      });
+  showLogs(logs: ScenarioLogEntry[]) {
+    this.logs = logs.slice();
+    this.entries = [];
+    logs.forEach(log => this.addLogLine(log));
+    this.scrollToBottom(true);
   }
 
   addLogLine(entry: ScenarioLogEntry, options?: { intermediateDots?: boolean }): void {
@@ -92,6 +92,16 @@ export class InjectablesComponent extends PageComponent implements OnInit {
   }
 
   editInjectable(injectable: ScenarioInjectable): void {
+    // the list contains only a summary of values stored in binary format
+    if (injectable.value?.binary !== undefined) {
+      const scenario = this.settings.activeScenario$.value;
+      if (!scenario) return;
+      this.rest.getScenarioInjectable(injectable.id, scenario).subscribe(full => {
+        injectable.value = full.value;
+        this.editInjectable(injectable);
+      });
+      return;
+    }
     if (injectable.editable) {
       let defaultValue = undefined;
       const projectInj = this.settings.activeProject$?.value?.injectables.find(pInj => pInj.name === injectable.name);
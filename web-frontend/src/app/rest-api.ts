@@ -133,10 +133,13 @@ export interface ScenarioStep extends Step {
 }
 
 export interface  ScenarioLogEntry {
+  id?: number,
+  seq?: number,
   level: 'ERROR' | 'INFO' | 'DEBUG' | 'INTER',
   timestamp?: string,
   message: string,
-  scenario?: { success?: boolean, finished?: boolean }
+  scenario?: { success?: boolean, finished?: boolean },
+  status?: any
 }
 
 export function formatProject(project: Project, options?: { previewInjName?: string}) {
@@ -292,7 +295,8 @@ export class RestService {
 
   getScenarioInjectable(id: number, scenario: Scenario): Observable<ScenarioInjectable> {
     const injUrl = this.URLS.scenarioInjectables.replace('{scenarioId}', scenario.id!.toString());
-    return this.http.get<ScenarioInjectable>(`${injUrl}${id}/`);
+    // values stored in binary format are only sent on request
+    return this.http.get<ScenarioInjectable>(`${injUrl}${id}/`, { params: { binary: 'json' } });
   }
 
   patchUser(id: number, data: any): Observable<User> {
@@ -329,12 +333,22 @@ export class RestService {
     return this.http.patch<ScenarioStep>(`${url}${step.id}/`, options);
   }
 
-  getScenarioLogs(scenario: Scenario, options?: { level?: string, nLast?: number }): Observable<ScenarioLogEntry[]> {
+  getScenarioLogs(scenario: Scenario, options?: { level?: string, nLast?: number, afterId?: number,
+                  beforeId?: number, pageSize?: number }): Observable<ScenarioLogEntry[]> {
     const url = this.URLS.scenarioLogs.replace('{scenarioId}', scenario.id!.toString());
     let params = new HttpParams();
     if (options?.nLast) {
       params = params.set('n_last', options.nLast);
     }
+    if (options?.afterId !== undefined) {
+      params = params.set('after_id', options.afterId);
+    }
+    if (options?.beforeId !== undefined) {
+      params = params.set('before_id', options.beforeId);
+    }
+    if (options?.pageSize) {
+      params = params.set('page_size', options.pageSize);
+    }
     if (options?.level) {
       params = params.set('level', options.level);
     }
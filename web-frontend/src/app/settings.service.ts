@@ -22,12 +22,16 @@ export class SettingsService {
   isLoading$ = new BehaviorSubject<boolean>(false);
   private scenarioLogSocket?: WebSocket;
   onScenarioLogMessage = new EventEmitter<ScenarioLogEntry>;
+  // latest log entries of the active scenario, fetched before connecting
+  scenarioLogHistory$ = new BehaviorSubject<ScenarioLogEntry[]>([]);
   siteSettings?: SiteSettings;
   onStepStatusChange = new EventEmitter<{
     step: string, success: boolean, finished: boolean, started: boolean, timestamp: string}>;
   runFinished = new EventEmitter<{success: boolean}>;
   private readonly wsURL: string;
   private retries = 0;
+  // sequence number of the last received log entry of the active scenario
+  private lastSeq?: number;
 
   constructor(private cookies: CookieService, private rest: RestService, private auth: AuthService,
               private router: Router, private materialCssVarsService: MaterialCssVarsService) {
@@ -35,7 +39,7 @@ export class SettingsService {
     this.logLevel$.next(logLevel);
     this.activeScenario$.subscribe(scenario => {
       this.disconnect();
-      this.connect();
+      this.fetchLogHistory(scenario);
     });
     this.host = environment.backend? environment.backend: window.location.origin;
     const strippedHost = environment.backend? environment.backend.replace('http://', ''): window.location.hostname;
@@ -121,48 +125,49 @@ export class SettingsService {
     this.scenarioLogSocket.onclose = e => {};
     this.scenarioLogSocket.close();
     this.retries = 0;
+    this.lastSeq = undefined;
+  }
+
+  private fetchLogHistory(scenario: Scenario | undefined): void {
+    this.scenarioLogHistory$.next([]);
+    if (!scenario) return;
+    this.rest.getScenarioLogs(scenario, { level: 'DEBUG', nLast: environment.maxLogs }).subscribe({
+      next: logs => {
+        // scenario changed in the meantime
+        if (this.activeScenario$.value?.id !== scenario.id) return;
+        // connect after the history, entries logged in between are replayed
+        this.lastSeq = Math.max(0, ...logs.map(log => log.seq || 0));
+        this.scenarioLogHistory$.next(logs);
+        this.connect();
+      },
+      error: () => {
+        if (this.activeScenario$.value?.id === scenario.id) this.connect();
+      }
+    });
   }
 
   private connect(): void {
     if (this.activeScenario$.value === undefined) return;
     if (this.retries > 10) return;
-    this.scenarioLogSocket = new WebSocket(`${this.wsURL}${this.activeScenario$.value.id}/`);
+    // entries after the fetched history or missed while reconnecting are
+    // replayed
+    const query = (this.lastSeq !== undefined)? `?since=${this.lastSeq}`: '';
+    this.scenarioLogSocket = new WebSocket(`${this.wsURL}${this.activeScenario$.value.id}/${query}`);
     this.scenarioLogSocket.onopen = e => this.retries = 0;
     this.scenarioLogSocket.onmessage = e => {
-      const logEntry = JSON.parse(e.data);
-      if (logEntry.status){
-        const status = logEntry.status;
-        // step status update
-        if (logEntry.status.step) {
-          this.onStepStatusChange.emit({
-            step: status.step,
-            finished: status.finished,
-            success: status.success,
-            started: status.started,
-            timestamp: logEntry.timestamp
-          })
-        }
-        // scenario status update
-        else if (this.activeScenario$.value) {
-          const scenario = this.activeScenario$.value;
-          if (!scenario.last_run) {
-            scenario.last_run = {}
-          }
-          if (status.started) {
-            scenario.last_run.started = logEntry.timestamp;
-            scenario.is_running = true;
-          }
-          if (status.finished) {
-            scenario.last_run.finished = logEntry.timestamp;
-            scenario.is_running = false;
-            this.runFinished.emit({success: status.success})
-          }
-          if (status.success !== undefined) {
-            scenario.last_run.success = status.success;
-          }
-        }
+      // log entries are sent in batches
+      const frame: { id?: number, records: ScenarioLogEntry[], skipped?: number } = JSON.parse(e.data);
+      if (frame.skipped) {
+        this.onScenarioLogMessage.emit({
+          level: 'DEBUG',
+          message: `${frame.skipped} log messages skipped`
+        });
       }
-      this.onScenarioLogMessage.emit(logEntry);
+      frame.records.forEach(logEntry => this.handleLogEntry(logEntry));
+      // live frames are acknowledged, the server holds back further frames
+      // while too many are unacknowledged
+      if (frame.id !== undefined)
+        this.scenarioLogSocket?.send(JSON.stringify({ ack: frame.id }));
     }
     this.scenarioLogSocket.onclose = e => {
       this.retries += 1;
@@ -170,6 +175,44 @@ export class SettingsService {
     };
   }
 
+  private handleLogEntry(logEntry: ScenarioLogEntry): void {
+    if (logEntry.seq !== undefined && logEntry.seq !== null)
+      this.lastSeq = logEntry.seq;
+    if (logEntry.status){
+      const status = logEntry.status;
+      // step status update
+      if (logEntry.status.step) {
+        this.onStepStatusChange.emit({
+          step: status.step,
+          finished: status.finished,
+          success: status.success,
+          started: status.started,
+          timestamp: logEntry.timestamp!
+        })
+      }
+      // scenario status update
+      else if (this.activeScenario$.value) {
+        const scenario = this.activeScenario$.value;
+        if (!scenario.last_run) {
+          scenario.last_run = {}
+        }
+        if (status.started) {
+          scenario.last_run.started = logEntry.timestamp;
+          scenario.is_running = true;
+        }
+        if (status.finished) {
+          scenario.last_run.finished = logEntry.timestamp;
+          scenario.is_running = false;
+          this.runFinished.emit({success: status.success})
+        }
+        if (status.success !== undefined) {
+          scenario.last_run.success = status.success;
+        }
+      }
+    }
+    this.onScenarioLogMessage.emit(logEntry);
+  }
+
   getUser(id: number | undefined): User | undefined {
     return this.users.find(user => user.id === id);
   }